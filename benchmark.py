@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+生成器性能基准 - 用合成的放大版报价工作簿测量各提取阶段的耗时与内存峰值
+
+合成工作簿覆盖 extract_prices / load_gofo_zip_db / extract_fuel_rate 依赖的全部版式：
+GOFO 左右分表、FedEx 商住分表、XLmiles 服务分块、GOFO 邮编库、燃油费率单元格；
+行数按倍数（1×–50×）放大。每个阶段取多次运行的最短耗时，另跑一次 tracemalloc 记录峰值。
+与保存的基线比较，超出容差即以非 0 退出码失败；没有基线（或缺少某倍数 / 阶段）同样失败，
+需先在目标机器上用 --save-baseline 记录。
+
+用法:
+    python benchmark.py --scales 1 10 --save-baseline   # 记录基线
+    python benchmark.py --scales 1 10                   # 与基线比较
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+import generate_fixed as gen
+
+# 合成工作簿版本：修改生成逻辑后递增，旧的工作簿会重新生成
+SYNTH_VERSION = 1
+
+# 1× 时的行数（价格表重量档位 / GOFO 邮编库）
+BASE_PRICE_ROWS = 60
+BASE_ZIP_ROWS = 3000
+
+# 各 Tier 价格倍率
+TIER_MULT = {"T0": 1.0, "T1": 0.95, "T2": 0.9, "T3": 1.0}
+
+# 邮编库样本：州 / GOFO 大区 / 城市
+SYNTH_STATES = [
+    ("CA", "WE", "Los Angeles"), ("IL", "CE", "Chicago"), ("NY", "EA", "New York"),
+    ("TX", "CE", "Dallas"), ("WA", "WE", "Seattle"), ("FL", "EA", "Miami"),
+]
+
+DEFAULT_WORKDIR = os.path.join(gen.CACHE_DIR, "bench")
+DEFAULT_BASELINE = "benchmark_baseline.json"
+
+
+# ==========================================
+# 1. 合成工作簿
+# ==========================================
+
+def blank_grid(rows, cols):
+    return [[None] * cols for _ in range(rows)]
+
+
+def put_price_table(grid, r0, c0, weight_label, weights, zones, base, mult):
+    """在 (r0, c0) 写一张「重量 × Zone」价格表"""
+    grid[r0][c0] = weight_label
+    for i, z in enumerate(zones):
+        grid[r0][c0 + 1 + i] = f"Zone {z}"
+    for j, w in enumerate(weights):
+        grid[r0 + 1 + j][c0] = w
+        for i, z in enumerate(zones):
+            grid[r0 + 1 + j][c0 + 1 + i] = round((base + j * 0.37 + z * 0.81) * mult, 2)
+
+
+def synth_sheets(scale, mult):
+    """生成一个 Tier 工作簿的全部 Sheet：{sheet 名: 二维列表}"""
+    n = BASE_PRICE_ROWS * scale
+    nz = BASE_ZIP_ROWS * scale
+    sheets = {}
+
+    # GOFO：价格表 + 右侧邮编库（邮编混合数字 / 文本两种单元格）
+    g = blank_grid(3 + max(n, nz) + 1, 14)
+    g[0][0] = "GOFO 报价"
+    put_price_table(g, 2, 0, "重量(lb)", list(range(1, n + 1)), range(1, 9), 4.0, mult)
+    g[2][10:14] = ["目的地邮编", "城市", "省州", "GOFO_大区"]
+    for k in range(nz):
+        state, region, city = SYNTH_STATES[k % len(SYNTH_STATES)]
+        z = 1000 + (k * 7) % 98000
+        g[3 + k][10] = float(z) if k % 3 else str(z).zfill(5)
+        g[3 + k][11:14] = [city, state, region]
+    sheets["GOFO报价"] = g
+
+    # GOFO-UNIUNI-MT：左右分表，oz/lb 混合重量，左侧带 $ 文本价格
+    g = blank_grid(5 + n, 21)
+    g[0][0], g[0][1] = "燃油附加费", "已包含"
+    weights = [f"{o} oz" for o in (4, 8, 12)] + [f"{w} lb" for w in range(1, n - 2)]
+    for c0 in (0, 11):
+        g[3][c0], g[3][c0 + 1] = "重量(oz/lb)", "重量(kg)"
+        for i in range(8):
+            g[3][c0 + 2 + i] = f"Zone {i + 1}"
+    for j, w in enumerate(weights):
+        g[4 + j][0] = g[4 + j][11] = w
+        g[4 + j][1] = g[4 + j][12] = "x kg"
+        for i in range(8):
+            g[4 + j][2 + i] = f"${round((3 + j * 0.2 + i * 0.3) * mult, 2)}"
+            g[4 + j][13 + i] = round((2.5 + j * 0.25 + i * 0.2) * mult, 2)
+    sheets["GOFO-UNIUNI-MT报价"] = g
+
+    g = blank_grid(3 + n + 1, 10)
+    put_price_table(g, 2, 0, "Weight(lb)", [w / 2 for w in range(1, n + 1)], range(1, 9), 5.0, mult)
+    sheets["USPS-YSD报价"] = g
+
+    # FedEx 商住分表：左住宅 / 右商业，燃油费率写在表头
+    for name, base in (("FedEx-632-MT报价", 9.0), ("FedEx-MT-超大包裹报价", 40.0)):
+        g = blank_grid(4 + n + 1, 18)
+        g[0][0] = "FedEx 632"
+        g[1][0], g[1][1] = "燃油附加费", "16.5%"
+        g[2][0], g[2][10] = "住宅地址", "商业地址"
+        weights = [round(w * 0.5, 1) for w in range(1, n + 1)]
+        put_price_table(g, 3, 0, "重量(lb)", weights, range(2, 9), base + 1.5, mult)
+        put_price_table(g, 3, 10, "重量(lb)", weights, range(2, 9), base, mult)
+        sheets[name] = g
+
+    for name, base in (("FedEx-ECO-MT报价", 7.0), ("FedEx-MT-危险品报价", 15.0), ("GOFO大件-MT报价", 20.0)):
+        g = blank_grid(3 + n + 1, 10)
+        put_price_table(g, 2, 0, "重量 (lb)", list(range(1, n + 1)), range(2, 9), base, mult)
+        sheets[name] = g
+
+    # XLmiles：服务名只写在每块第一行，重量为区间文本
+    g = blank_grid(2 + 3 * n, 8)
+    g[1][0], g[1][2], g[1][3], g[1][4], g[1][5] = "服务", "重量", "Zone 2", "Zone 3", "Zone 6"
+    r = 2
+    for service, base in (("AH 大件", 50), ("OS 大件", 80), ("OM 超限", 120)):
+        for j in range(n):
+            g[r][0] = service if j == 0 else None
+            g[r][2] = f"{j * 5}-{(j + 1) * 5} lbs"
+            g[r][3:6] = [round((base + j) * mult, 2), round((base + j + 5) * mult, 2),
+                         round((base + j + 20) * mult, 2)]
+            r += 1
+    sheets["XLmiles报价"] = g
+    return sheets
+
+
+def write_workbook(path, scale, mult):
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        for name, grid in synth_sheets(scale, mult).items():
+            pd.DataFrame(grid).to_excel(writer, sheet_name=name, header=False, index=False)
+
+
+def ensure_workbooks(workdir, scale):
+    """生成（或复用）某倍数下的 T0–T3 合成工作簿，返回所在目录"""
+    out = os.path.join(workdir, f"v{SYNTH_VERSION}-x{scale}")
+    os.makedirs(out, exist_ok=True)
+    for tier, filename in gen.TIER_FILES.items():
+        path = os.path.join(out, filename)
+        if not os.path.exists(path):
+            print(f"  [..] Generating {scale}x {filename}")
+            tmp_path = os.path.join(out, f".tmp-{filename}")
+            write_workbook(tmp_path, scale, TIER_MULT.get(tier, 1.0))
+            os.replace(tmp_path, path)
+    return out
+
+
+# ==========================================
+# 2. 阶段定义（state 在阶段间传递中间结果）
+# ==========================================
+
+def stage_read_excel(state):
+    for filename in gen.TIER_FILES.values():
+        gen.release_workbook(filename)
+    state["sheets"] = {tier: gen.load_workbook(f) for tier, f in gen.TIER_FILES.items()}
+
+
+def stage_fuel_rate(state):
+    state["fuel"] = {tier: gen.extract_fuel_rate(s) for tier, s in state["sheets"].items()}
+
+
+def stage_gofo_zip_db(state):
+    state["zip_db"] = gen.load_gofo_zip_db(gen.TIER_FILES[gen.ZIP_DB_TIER], cache_mode="off")
+
+
+def stage_extract_prices(state):
+    tiers = {}
+    for tier, sheets in state["sheets"].items():
+        tier_data = {}
+        for ch_key, conf in gen.CHANNEL_CONFIG.items():
+            entry = gen.extract_channel(sheets, ch_key, conf, state["fuel"][tier], cache_mode="off")
+            if entry is not None:
+                tier_data[ch_key] = entry
+        tiers[tier] = tier_data
+    state["tiers"] = tiers
+
+
+def stage_page_encode(state):
+    final_data = {
+        "warehouses": gen.WAREHOUSE_DB,
+        "channels": gen.CHANNEL_CONFIG,
+        "gofo_zips": state["zip_db"],
+        "fedex_das": {c: [] for c in gen.DAS_CLASSES},
+        "tiers": state["tiers"],
+    }
+    with open(os.devnull, "w", encoding="utf-8") as f:
+        state["html_size"] = gen.write_html(f, gen.build_page_data(final_data))
+
+
+STAGES = [
+    ("read_excel", stage_read_excel),
+    ("fuel_rate", stage_fuel_rate),
+    ("gofo_zip_db", stage_gofo_zip_db),
+    ("extract_prices", stage_extract_prices),
+    ("page_encode", stage_page_encode),
+]
+
+
+def measure(func, state, repeat):
+    """返回 (最短耗时秒, tracemalloc 峰值 MB)；内存单独跑一次，避免跟踪开销计入耗时"""
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            func(state)
+            times.append(time.perf_counter() - t0)
+        # 生成器自身的构建报告记录不保留，避免跨轮次累积
+        gen.take_report_records()
+        tracemalloc.start()
+        try:
+            func(state)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return min(times), peak / 1024 / 1024
+
+
+def run_scale(data_dir, repeat):
+    """在 data_dir 上依次运行全部阶段，返回 {阶段: {"seconds", "peak_mb"}}"""
+    saved_dir = gen.DATA_DIR
+    gen.DATA_DIR = data_dir
+    state = {}
+    results = {}
+    try:
+        for name, func in STAGES:
+            seconds, peak_mb = measure(func, state, repeat)
+            results[name] = {"seconds": round(seconds, 4), "peak_mb": round(peak_mb, 2)}
+    finally:
+        for filename in gen.TIER_FILES.values():
+            gen.release_workbook(filename)
+        gen.DATA_DIR = saved_dir
+    return results
+
+
+# ==========================================
+# 3. 基线比较
+# ==========================================
+
+def compare(results, baseline, tolerance, mem_tolerance, min_delta):
+    """返回超出基线容差的阶段说明列表；基线中没有的倍数 / 阶段同样算失败（需先 --save-baseline）"""
+    failures = []
+    for scale, stages in results.items():
+        for stage, cur in stages.items():
+            base = baseline.get(scale, {}).get(stage)
+            if not base:
+                failures.append(f"{scale} {stage}: no baseline recorded")
+                continue
+            slower = cur["seconds"] - base["seconds"]
+            if cur["seconds"] > base["seconds"] * (1 + tolerance) and slower > min_delta:
+                failures.append(f"{scale} {stage}: {cur['seconds']:.3f}s vs baseline {base['seconds']:.3f}s")
+            if cur["peak_mb"] > base["peak_mb"] * (1 + mem_tolerance) and cur["peak_mb"] - base["peak_mb"] > 1:
+                failures.append(f"{scale} {stage}: peak {cur['peak_mb']:.1f}MB vs baseline {base['peak_mb']:.1f}MB")
+    return failures
+
+
+def fmt_num(value, digits):
+    return "-" if value is None else f"{value:.{digits}f}"
+
+
+def print_table(results, baseline):
+    print(f"\n{'scale':>6}  {'stage':<16}{'time(s)':>10}{'base(s)':>10}{'peak(MB)':>10}{'base(MB)':>10}")
+    for scale, stages in results.items():
+        for stage, cur in stages.items():
+            base = baseline.get(scale, {}).get(stage, {})
+            print(f"{scale:>6}  {stage:<16}{cur['seconds']:>10.3f}{fmt_num(base.get('seconds'), 3):>10}"
+                  f"{cur['peak_mb']:>10.1f}{fmt_num(base.get('peak_mb'), 1):>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成器各阶段耗时 / 内存基准")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10], help="行数放大倍数（1–50）")
+    parser.add_argument("--repeat", type=int, default=3, help="每阶段计时次数，取最短")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR, help="合成工作簿目录（按倍数复用）")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线文件")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果写为基线")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许的耗时增幅（比例）")
+    parser.add_argument("--mem-tolerance", type=float, default=0.25, help="允许的内存峰值增幅（比例）")
+    parser.add_argument("--min-delta", type=float, default=0.05, help="耗时增加不足该秒数时不算退化")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print(f"⏱️  Generator benchmark: scales {args.scales}, repeat {args.repeat}")
+    print("=" * 60)
+
+    results = {}
+    for scale in args.scales:
+        data_dir = ensure_workbooks(args.workdir, scale)
+        print(f"  [..] Running {scale}x")
+        results[f"{scale}x"] = run_scale(data_dir, args.repeat)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+    print_table(results, baseline)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "pandas": pd.__version__,
+                "machine": platform.machine(),
+                "results": dict(baseline, **results),
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n[OK] Baseline saved: {args.baseline}")
+        return 0
+
+    if not baseline:
+        print(f"\n[Err] No baseline at {args.baseline}; run with --save-baseline to record one")
+        return 1
+
+    failures = compare(results, baseline, args.tolerance, args.mem_tolerance, args.min_delta)
+    if failures:
+        print("\n[Err] Regressions past baseline:")
+        for line in failures:
+            print(f"  - {line}")
+        return 1
+    print("\n[OK] All stages within baseline tolerance")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,23 @@
+import numpy as np
 import pandas as pd
 import json
 import re
 import os
 import warnings
 import subprocess
+import argparse
+import base64
+import contextlib
+import hashlib
+import io
+import math
+import pickle
+import shutil
+import threading
+import time
+import tracemalloc
+import cProfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime
 
 # 忽略 Excel 样式警告
@@ -19,6 +33,52 @@ TIER_FILES = {
     "T0": "T0.xlsx", "T1": "T1.xlsx", "T2": "T2.xlsx", "T3": "T3.xlsx"
 }
 
+# FedEx DAS 偏远邮编 PDF
+DAS_PDF_FILES = [
+    "FGE_DAS_Contiguous_Extended_Alaska_Hawaii_2025.pdf",
+    "FGE_DAS_Zip_Code_Changes_2025.pdf"
+]
+ZIP5_RE = re.compile(r'\b\d{5}\b')
+
+# DAS 分类：contiguous / extended / alaska / hawaii 来自 PDF 章节，remote = 阿拉斯加 + 夏威夷
+DAS_CLASSES = ["contiguous", "extended", "remote", "alaska", "hawaii"]
+DAS_SECTION_NAMES = {
+    "CONTIGUOUS U.S.": "contiguous", "CONTIGUOUS U.S.: EXTENDED": "extended",
+    "CONTIGUOUS U.S. EXTENDED": "extended", "ALASKA": "alaska", "HAWAII": "hawaii"
+}
+# 完整列表章节标题，如 "Delivery Area Surcharge ZIP codes: Contiguous U.S.: Extended (cont.)"
+DAS_LIST_HEADING_RE = re.compile(r'ZIP codes:\s*(.+?)\s*(?:\(cont\.\))?\s*$', re.I)
+# 变更清单章节标题，如 "MOVED FROM CONTIGUOUS U.S. LIST TO CONTIGUOUS U.S. EXTENDED LIST:"
+DAS_CHANGE_HEADING_RE = re.compile(
+    r'^(ADDED TO|MOVED FROM|REMOVED FROM)\s+(.+?)\s+LIST(?:\s+TO\s+(.+?)\s+LIST)?\s*:', re.I)
+DAS_BITMAP_SIZE = 100000
+
+# 分片输出目录（相对 OUTPUT_DIR）
+SHARD_DIR = "shards"
+
+# 构建缓存目录；PARSER_VERSION 在提取逻辑变更时递增，使旧缓存整体失效
+CACHE_DIR = ".build_cache"
+PARSER_VERSION = 5
+
+# 已识别的 Sheet 版式（表头行 / 重量列 / Zone 列 / 左右分界）按结构指纹记录在此，各 Tier 共用
+LAYOUT_DIR = os.path.join(CACHE_DIR, "layouts")
+LAYOUT_VARIANTS = 4
+
+# 价格表的固定小数位：提取时即按此取整，页面 / quote_engine 读到的是同一份数值
+PRICE_DECIMALS = 4
+WEIGHT_DECIMALS = 4
+
+# 构建报告（各阶段耗时 / 行数 / 单元格 / 字节）与 --profile 的 cProfile 输出
+REPORT_FILE = "build_report.json"
+PROFILE_FILE = "build_profile.prof"
+
+# --watch：轮询 data/ 的间隔，以及文件停止变化多久后才开始重建（秒）
+WATCH_INTERVAL = 0.5
+WATCH_DEBOUNCE = 1.0
+
+# GOFO 邮编库所在的 Tier（与该 Tier 的价格提取共用同一次工作簿解析）
+ZIP_DB_TIER = "T0"
+
 # 州名映射
 US_STATES_CN = {
     'AL': '阿拉巴马', 'AK': '阿拉斯加', 'AZ': '亚利桑那', 'AR': '阿肯色', 'CA': '加利福尼亚',
@@ -107,6 +167,35 @@ XLMILES_ZONE_MAP = {
     '600-629': 6, '630-699': 6, '700-729': 6, '730-799': 6,
     '400-599': 6, '000-199': 6, '200-399': 6
 }
+XLMILES_DEFAULT_ZONE = 6
+
+# 通用 Zone（FedEx/USPS）：按仓库大区的目的邮编前 3 位区间，按顺序取第一个命中的区间
+GENERAL_ZONE_MAP = {
+    "WEST": {
+        '900-935': 2, '936-961': 3, '962-994': 4, '995-999': 4,
+        '800-899': 5, '700-799': 6, '000-199': 8
+    },
+    "EAST": {
+        '000-099': 2, '100-199': 3, '200-299': 4, '300-499': 5,
+        '500-699': 6, '900-999': 8
+    },
+    "CENTRAL": {
+        '600-629': 2, '630-659': 3, '400-599': 4, '660-699': 5,
+        '900-999': 7, '000-199': 6
+    }
+}
+GENERAL_DEFAULT_ZONE = {"WEST": 7, "EAST": 7, "CENTRAL": 5}
+
+# GOFO Zone：仓库大区 × 目的地 GOFO 大区（WE/CE/EA），未命中取 GOFO_DEFAULT_ZONE
+GOFO_REGION_ZONES = {
+    "WEST": {"WE": 2, "CE": 5, "EA": 8},
+    "CENTRAL": {"CE": 2, "WE": 5, "EA": 6},
+    "EAST": {"EA": 2, "WE": 8, "CE": 6}
+}
+GOFO_DEFAULT_ZONE = 8
+
+# 邮编不足 3 位或仓库大区未知时的 Zone
+FALLBACK_ZONE = 8
 
 # ==========================================
 # 2. HTML/JS 模板（保持不变，与之前相同）
@@ -132,6 +221,7 @@ HTML_TEMPLATE = r"""
     .tag-fedex { background: #cfe2ff; color: #084298; padding: 3px 8px; border-radius: 4px; border: 1px solid #b6d4fe; display: block; }
     .status-ok { color: #198754; font-weight: 700; }
     .status-err { color: #dc3545; font-weight: 700; }
+    .matrix-best { background: #d1e7dd !important; box-shadow: inset 0 0 0 2px #198754; }
     .error-alert { background: #f8d7da; border: 1px solid #f5c6cb; color: #721c24; padding: 10px; border-radius: 6px; margin-top: 10px; }
   </style>
 </head>
@@ -225,6 +315,7 @@ HTML_TEMPLATE = r"""
             <div id="errorBox" class="error-alert" style="display:none;"></div>
 
             <button type="button" class="btn btn-primary w-100 mt-4 fw-bold py-2" id="btnCalc">计算报价 (Calculate)</button>
+            <button type="button" class="btn btn-outline-primary w-100 mt-2 fw-bold" id="btnMatrix">全仓 × 全等级对比</button>
           </form>
         </div>
       </div>
@@ -269,59 +360,90 @@ HTML_TEMPLATE = r"""
       </div>
     </div>
   </div>
+
+  <div class="card mt-4">
+    <div class="card-header d-flex justify-content-between align-items-center">
+      <span>🧮 全仓对比</span>
+      <span class="small text-muted fw-normal" id="matrixBest"></span>
+    </div>
+    <div class="card-body">
+      <div class="table-responsive">
+        <table class="table table-sm table-hover align-middle small mb-0">
+          <thead class="table-light text-secondary" id="matrixHead"></thead>
+          <tbody id="matrixBody">
+            <tr><td class="text-center py-3 text-muted">点击「全仓 × 全等级对比」，同一包裹按全部仓库 / 客户等级 / 渠道报价</td></tr>
+          </tbody>
+        </table>
+      </div>
+    </div>
+  </div>
+
+  <div class="card mt-4">
+    <div class="card-header d-flex justify-content-between align-items-center">
+      <span>📋 批量报价</span>
+      <span class="small text-muted fw-normal">仓库 / Tier / 燃油 / 签名 取左侧表单</span>
+    </div>
+    <div class="card-body">
+      <textarea class="form-control font-monospace small" id="batchInput" rows="6"
+        placeholder="从 Excel 粘贴或输入 CSV，每行: 邮编, 长, 宽, 高, 实重[, res/com]&#10;90001,12,10,8,5.5,res&#10;10001,20,15,10,12,com"></textarea>
+      <div class="d-flex align-items-center gap-2 mt-2">
+        <button class="btn btn-primary btn-sm" id="btnBatch">批量计算</button>
+        <button class="btn btn-outline-secondary btn-sm" id="btnBatchCsv" disabled>下载 CSV</button>
+        <div class="progress flex-grow-1" style="height: 18px;">
+          <div class="progress-bar" id="batchBar" style="width: 0%"></div>
+        </div>
+      </div>
+      <div class="small text-muted mt-2" id="batchSummary"></div>
+      <div class="table-responsive mt-2" style="max-height: 420px;">
+        <table class="table table-sm table-hover align-middle small">
+          <thead class="table-light text-secondary" id="batchHead"></thead>
+          <tbody id="batchBody"></tbody>
+        </table>
+      </div>
+    </div>
+  </div>
 </div>
 
 <footer class="text-center py-4 text-muted small">
   &copy; 2026 SureGo Logistics | Data Generated: <span id="updateTime"></span>
 </footer>
 
-<script>
-  const DATA = __JSON_DATA__;
-  document.getElementById('updateTime').innerText = new Date().toLocaleDateString();
-
-  // [前端代码保持与之前相同，此处省略重复代码]
-  // 包含: 邮编双显示、规格校验、Zone计算、主计算函数等
-  
-  // 1. 邮编双显示
-  document.getElementById('zipCode').addEventListener('input', function() {
-    let zip = this.value.trim();
-    let display = document.getElementById('locDisplay');
-    this.value = this.value.replace(/\D/g, '');
-    
-    if(zip.length === 5) {
-        let html = '';
-        if(DATA.gofo_zips && DATA.gofo_zips[zip]) {
-            let g = DATA.gofo_zips[zip];
-            html += `<div class="tag-gofo">🟢 [GOFO表] ${g.city}, ${g.state} (${g.cn_state}) - 区:${g.region}</div>`;
-        }
-        let fedexInfo = "通用地区";
-        if(DATA.fedex_das_remote && DATA.fedex_das_remote.includes(zip)) {
-            fedexInfo = "⚠️ FedEx 偏远 (Remote)";
-        }
-        html += `<div class="tag-fedex">🔵 [FedEx/通用] ${fedexInfo}</div>`;
-        display.innerHTML = `<div class="loc-box">${html}</div>`;
-    } else {
-        display.innerHTML = '';
-    }
-  });
+<script id="quoteData" type="application/json">__JSON_DATA__</script>
+<script id="quoteCore">
+  // 报价核心：只读全局 DATA、不碰 DOM；页面直接使用，批量 Worker 取本脚本源码运行同一份逻辑
 
-  // 2. 燃油初始化
-  (function initFuel() {
-    let maxFuel = 0;
-    if(DATA.tiers && DATA.tiers.T3) {
-        Object.values(DATA.tiers.T3).forEach(ch => {
-            if(ch.fuel_rate && ch.fuel_rate > maxFuel) maxFuel = ch.fuel_rate;
-        });
+  // GOFO 邮编表（按 3 位前缀分块）：某前缀第一次被查到时才把它的记录串解码成 {后两位: 记录}
+  const GOFO_CHUNKS = {};
+  function gofoChunk(prefix) {
+    const t = DATA.gofo_zips;
+    if(!GOFO_CHUNKS[prefix] && t && t.chunks && t.chunks[prefix]) {
+      const c = t.chunks[prefix], [cw, sw, rw] = t.widths, step = 2 + cw + sw + rw;
+      const rows = {};
+      for(let i = 0; i < c.rec.length; i += step) {
+        const s = parseInt(c.rec.substr(i + 2 + cw, sw), 36);
+        rows[c.rec.substr(i, 2)] = {
+          city: c.cities[parseInt(c.rec.substr(i + 2, cw), 36)],
+          state: t.states[s],
+          cn_state: t.cn_states[s],
+          region: t.regions[parseInt(c.rec.substr(i + 2 + cw + sw, rw), 36)]
+        };
+      }
+      GOFO_CHUNKS[prefix] = rows;
     }
-    if(maxFuel > 0) document.getElementById('fuelInput').value = (maxFuel * 100).toFixed(2);
-  })();
+    return GOFO_CHUNKS[prefix];
+  }
+  function gofoLookup(zip) {
+    if(!zip || zip.length !== 5) return null;
+    const rows = gofoChunk(zip.substring(0, 3));
+    return (rows && rows[zip.substring(3)]) || null;
+  }
 
   // 3. XLmiles服务判定
   function getXLService(L, W, H, Wt) {
     let dims = [L, W, H].sort((a,b)=>b-a);
     let maxL = dims[0];
     let girth = maxL + 2*(dims[1] + dims[2]);
-    
+
     if (maxL <= 96 && girth <= 130 && Wt <= 150) return { code: "AH", name: "AH大件" };
     if (maxL <= 108 && girth <= 165 && Wt <= 150) return { code: "OS", name: "OS大件" };
     if (maxL <= 144 && girth <= 225 && Wt <= 200) return { code: "OM", name: "OM超限" };
@@ -333,34 +455,434 @@ HTML_TEMPLATE = r"""
     let dims = [pkg.L, pkg.W, pkg.H].sort((a,b)=>b-a);
     let L = dims[0], G = dims[0] + 2*(dims[1] + dims[2]);
     let msgs = [];
-    
+
     if (pkg.Wt > 150 && pkg.Wt <= 200) msgs.push("重量 150-200lb (仅限XLmiles-OM)");
     if (pkg.Wt > 200) msgs.push("超200lb (所有渠道拒收)");
     if (L > 108 && L <= 144) msgs.push("长度 108-144in (仅限XLmiles)");
     if (L > 144) msgs.push("长度>144in (所有渠道拒收)");
     if (G > 165 && G <= 225) msgs.push("周长 165-225in (仅限XLmiles)");
     if (G > 225) msgs.push("周长>225in (所有渠道拒收)");
-    
+
     let status = {
       uniuni: (pkg.Wt > 20 || L > 20) ? "❌ 超限" : "✅ 可用",
       usps: (pkg.Wt > 70 || G > 130) ? "❌ 超限" : "✅ 可用",
       fedex_std: (pkg.Wt > 150 || L > 108) ? "❌ 超限" : "✅ 可用",
       xl: (pkg.Wt > 200 || L > 144 || G > 225) ? "❌ 超限" : "✅ 可用"
     };
-    
+
     return { msgs, status };
   }
 
+  // 6. Zone计算（查表：DATA.zones 由生成器从 Python 的 Zone 定义编译而来）
+  const ZONE_TABLES = {};
+  function zoneTable(source, region) {
+    const key = `${source}:${region}`;
+    if(!(key in ZONE_TABLES)) {
+      const raw = (DATA.zones[source] || {})[region];
+      ZONE_TABLES[key] = raw ? Uint8Array.from(raw, ch => ch.charCodeAt(0) - 48) : null;
+    }
+    return ZONE_TABLES[key];
+  }
+
+  function calcZone(destZip, originZip, conf) {
+    if(!destZip || destZip.length < 3) return DATA.zones.fallback;
+
+    let whRegion = DATA.warehouses[originZip].region;
+
+    if(conf.zone_source === 'gofo') {
+        let g = gofoLookup(destZip);
+        let pairs = DATA.zones.gofo[whRegion] || {};
+        return (g && pairs[g.region]) || DATA.zones.gofo_default;
+    }
+
+    let tbl = zoneTable(conf.zone_source === 'xlmiles' ? 'xlmiles' : 'general', whRegion);
+    return tbl ? tbl[parseInt(destZip.substring(0,3))] : DATA.zones.fallback;
+  }
+
+  // 7. 输入验证
+  function validateInputs(whCode, zip, pkg) {
+    let errors = [];
+    if(!whCode) errors.push("请选择发货仓库");
+    if(!zip || zip.length !== 5) errors.push("请输入5位邮编");
+    if(pkg.Wt <= 0) errors.push("实重必须大于0");
+    if(pkg.L <= 0 || pkg.W <= 0 || pkg.H <= 0) errors.push("包裹尺寸必须大于0");
+    return errors;
+  }
+
+  // 8. 价格表：各 Tier 只存 {s 骨架, b 基准矩阵, k/kd 倍数, di/dv 稀疏差值}，首次使用时还原成定型数组
+  //    骨架 = 重量向量 w + Zone 表头；矩阵行优先，0 = 无价；取整方式与生成器的 js_round 一致
+  const PRICE_TABLES = new WeakMap();
+  const SKELETONS = [];
+  function skeleton(s) {
+    if(!SKELETONS[s]) {
+      const raw = DATA.price_base.skeletons[s];
+      let col = {};
+      raw.zones.forEach((z, j) => { col[z] = j; });
+      SKELETONS[s] = { w: Float64Array.from(raw.w), n: raw.w.length, nz: raw.zones.length, col };
+    }
+    return SKELETONS[s];
+  }
+
+  function priceTable(raw) {
+    if(!raw) return null;
+    let t = PRICE_TABLES.get(raw);
+    if(!t) {
+      const scale = 10 ** DATA.price_base.decimals;
+      const round = v => Math.round(v * scale) / scale;
+      const src = DATA.price_base.bases[raw.b];
+      let m;
+      if(raw.k !== undefined) {
+        const ks = 10 ** raw.kd;
+        m = Float64Array.from(src, v => Math.round(v * raw.k * ks) / ks);
+      } else {
+        m = Float64Array.from(src);
+      }
+      (raw.di || []).forEach((i, n) => { m[i] = round(m[i] + raw.dv[n]); });
+      t = Object.assign({ m }, skeleton(raw.s));
+      PRICE_TABLES.set(raw, t);
+    }
+    return t;
+  }
+
+  function priceAt(t, i, zone) {
+    let j = t.col[zone];
+    return j === undefined ? 0 : t.m[i * t.nz + j];
+  }
+
+  // 重量档位查找：生成器已按重量排序，二分找 [lo, hi) 内第一个 w >= wt 的档位
+  function lowerBound(w, wt, lo, hi) {
+    while(lo < hi) {
+      let mid = (lo + hi) >> 1;
+      if(w[mid] < wt) lo = mid + 1; else hi = mid;
+    }
+    return lo;
+  }
+
+  // 9. 报价缓存：Map 按插入顺序淘汰最久未用的键
+  const ZIP_CONTEXT_LIMIT = 256;
+  const BASE_PRICE_LIMIT = 4096;
+
+  function lruCache(limit) {
+    return { limit, map: new Map() };
+  }
+  function lruGet(cache, key, compute) {
+    if(cache.map.has(key)) {
+      const v = cache.map.get(key);
+      cache.map.delete(key);
+      cache.map.set(key, v);
+      return v;
+    }
+    const v = compute();
+    cache.map.set(key, v);
+    if(cache.map.size > cache.limit) cache.map.delete(cache.map.keys().next().value);
+    return v;
+  }
+
+  // 邮编上下文：GOFO 记录 + 每个 (仓库, Zone 来源) 的 Zone，一个邮编只算一次（DAS 类别由页面补上）
+  //  分片输出时该前缀的 GOFO 块还没到，结果不可信，不进缓存
+  const ZIP_CONTEXTS = lruCache(ZIP_CONTEXT_LIMIT);
+  function gofoReady(zip) {
+    const t = DATA.gofo_zips;
+    const prefix = (zip || '').substring(0, 3);
+    return !t || !/^\d{3}$/.test(prefix) || t.index[+prefix] !== '1' || !!t.chunks[prefix];
+  }
+  function buildZipContext(zip) {
+    let ctx = { zip, gofo: gofoLookup(zip), zones: {} };
+    const sources = [...new Set(Object.values(DATA.channels).map(conf => conf.zone_source))];
+    Object.keys(DATA.warehouses).forEach(whCode => sources.forEach(src => {
+      ctx.zones[`${whCode}:${src}`] = calcZone(zip, whCode, { zone_source: src });
+    }));
+    return ctx;
+  }
+  function zipContext(zip) {
+    return gofoReady(zip) ? lruGet(ZIP_CONTEXTS, zip, () => buildZipContext(zip)) : buildZipContext(zip);
+  }
+
+  // 10. 报价：同一包裹的体积重 / 规格校验 / XL 服务只算一次，计费重按精度缓存在上下文里，Zone 取邮编上下文；
+  //     单票、批量、全仓对比共用；金额不取整，展示时再 toFixed
+  function shipmentContext(zip, pkg) {
+    return {
+      zip, pkg,
+      dimWt: (pkg.L * pkg.W * pkg.H) / 222,
+      comp: checkCompliance(pkg),
+      xl: getXLService(pkg.L, pkg.W, pkg.H, pkg.Wt),
+      weights: {},
+      zipCtx: zipContext(zip)
+    };
+  }
+
+  function channelAllowed(ctx, chName) {
+    const status = ctx.comp.status;
+    if(chName.includes("UNIUNI") && status.uniuni.includes("❌")) return false;
+    if(chName.includes("USPS") && status.usps.includes("❌")) return false;
+    if(chName.includes("XLmiles") && status.xl.includes("❌")) return false;
+    if(chName.includes("FedEx") && !chName.includes("超大") && status.fedex_std.includes("❌")) return false;
+    return true;
+  }
+
+  function billableWeight(ctx, precision) {
+    if(!(precision in ctx.weights)) {
+      let rawWt = Math.max(ctx.pkg.Wt, ctx.dimWt);
+      ctx.weights[precision] = Math.ceil(rawWt / precision) * precision;
+    }
+    return ctx.weights[precision];
+  }
+
+  function channelZone(ctx, whCode, conf) {
+    return ctx.zipCtx.zones[`${whCode}:${conf.zone_source}`];
+  }
+
+  // 基础运费：只取决于 Tier / 渠道 / 价格表 / Zone / 计费重 / XL 服务，结果进 LRU；
+  //  切换签名、燃油（以及不分商住表渠道的地址类型）时只重算附加费
+  const BASE_PRICES = lruCache(BASE_PRICE_LIMIT);
+  function lookupBasePrice(channelData, chName, priceKey, zone, finalWt, xlCode) {
+    let table = priceTable(channelData[priceKey]);
+    let basePrice = 0;
+
+    if (chName.includes("XLmiles")) {
+      // 在该服务的区间内二分，再跳过该 Zone 无价的档位
+      let range = ((channelData.service_ranges || {})[priceKey] || {})[xlCode];
+      if(range && table) {
+        let i = lowerBound(table.w, finalWt - 0.001, range[0], range[1]);
+        while(i < range[1] && !(priceAt(table, i, zone) > 0)) i++;
+        if(i < range[1]) basePrice = priceAt(table, i, zone) || priceAt(table, i, 6) || 0;
+      }
+    } else if(table) {
+      let i = lowerBound(table.w, finalWt - 0.001, 0, table.n);
+      if(i < table.n) basePrice = priceAt(table, i, zone) || priceAt(table, i, 8) || 0;
+    }
+    return basePrice;
+  }
+
+  // 单个 (仓库, Tier, 渠道) 的计价明细；不可用 / 无价返回 null
+  function quoteChannel(ctx, whCode, tier, chName, isRes, sigOn, fuelRateInput) {
+    const conf = DATA.channels[chName];
+
+    if(!conf.allow_wh.includes(whCode)) return null;
+    if(!channelAllowed(ctx, chName)) return null;
+
+    let precision = conf.weight_precision || 1;
+    let finalWt = billableWeight(ctx, precision);
+
+    let zone = channelZone(ctx, whCode, conf);
+    let q = { channel: chName, zone, finalWt, precision, split: null, xl: null };
+    // Tier 分片未到时不查价，免得把 0 写进缓存
+    const tierData = (DATA.tiers || {})[tier];
+    if(!tierData) return null;
+    const channelData = tierData[chName] || {};
+    let priceKey = 'prices';
+    let xlCode = '';
+
+    // 商住分表：按地址类型选择住宅/商业价格
+    if (channelData.prices_residential && channelData.prices_commercial) {
+      priceKey = isRes ? 'prices_residential' : 'prices_commercial';
+      q.split = isRes ? 'res' : 'com';
+    }
+
+    if (chName.includes("XLmiles")) {
+      q.xl = ctx.xl.name;
+      if(!ctx.xl.code) return null;
+      xlCode = ctx.xl.code;
+    }
+
+    let basePrice = lruGet(BASE_PRICES, `${tier}|${chName}|${priceKey}|${zone}|${finalWt}|${xlCode}`,
+                           () => lookupBasePrice(channelData, chName, priceKey, zone, finalWt, xlCode));
+
+    if(basePrice <= 0) return null;
+
+    let surcharges = 0;
+    q.res = isRes && conf.fees.res > 0 ? conf.fees.res : 0;
+    q.sig = sigOn && conf.fees.sig > 0 ? conf.fees.sig : 0;
+    surcharges += q.res;
+    surcharges += q.sig;
+
+    q.fuelMode = conf.fuel_mode;
+    if(conf.fuel_mode !== 'none' && conf.fuel_mode !== 'included') {
+      let rate = fuelRateInput / 100;
+      if (conf.fuel_mode === 'discount_85') rate = rate * 0.85;
+      q.fuelRate = rate;
+      q.fuel = (basePrice + surcharges) * rate;
+      surcharges += q.fuel;
+    }
+
+    q.base = basePrice;
+    q.total = basePrice + surcharges;
+    return q;
+  }
+
+  // 单票报价：该仓库 / Tier 下全部可用渠道
+  function quoteChannels(whCode, tier, zip, pkg, isRes, sigOn, fuelRateInput) {
+    const ctx = shipmentContext(zip, pkg);
+    let quotes = [];
+    Object.keys(DATA.channels).forEach(chName => {
+      const q = quoteChannel(ctx, whCode, tier, chName, isRes, sigOn, fuelRateInput);
+      if(q) quotes.push(q);
+    });
+    return quotes;
+  }
+
+  // 全仓对比：一个包裹 × 全部仓库 × tiers × 渠道，一次算完；返回 {rows: [{wh, channel, quotes: {tier: q}}], best}
+  function quoteMatrix(tiers, zip, pkg, isRes, sigOn, fuelRateInput) {
+    const ctx = shipmentContext(zip, pkg);
+    let rows = [], best = null;
+    Object.keys(DATA.warehouses).forEach(whCode => {
+      Object.keys(DATA.channels).forEach(chName => {
+        let row = { wh: whCode, channel: chName, quotes: {} }, any = false;
+        tiers.forEach(tier => {
+          const q = quoteChannel(ctx, whCode, tier, chName, isRes, sigOn, fuelRateInput);
+          if(!q) return;
+          row.quotes[tier] = q;
+          any = true;
+          if(!best || q.total < best.q.total) best = { wh: whCode, tier, q };
+        });
+        if(any) rows.push(row);
+      });
+    });
+    return { rows, best };
+  }
+
+  // 批量报价：rows[start, end) 逐票报价，只回传各渠道总价与最低价渠道
+  function quoteBatchRows(job, start, end) {
+    let out = [];
+    for(let i = start; i < end; i++) {
+      const r = job.rows[i];
+      if(r.error) { out.push({ error: r.error }); continue; }
+      const errors = validateInputs(job.whCode, r.zip, r);
+      if(errors.length > 0) { out.push({ error: errors.join('; ') }); continue; }
+      let totals = {}, best = null;
+      quoteChannels(job.whCode, job.tier, r.zip, r, r.isRes, job.sigOn, job.fuelRate).forEach(q => {
+        totals[q.channel] = q.total;
+        if(!best || q.total < best.total) best = q;
+      });
+      out.push(best ? { totals, best: best.channel, bestTotal: best.total } : { totals, error: "无可用报价" });
+    }
+    return out;
+  }
+</script>
+<script>
+  // 页面数据以 JSON 数据岛内嵌：JSON.parse 比同样大小的对象字面量快得多
+  const DATA = JSON.parse(document.getElementById('quoteData').textContent);
+  document.getElementById('updateTime').innerText = new Date().toLocaleDateString();
+
+  // [前端代码保持与之前相同，此处省略重复代码]
+  // 包含: 邮编双显示、规格校验、Zone计算、主计算函数等
+
+  // 0. 数据分片：DATA.shards 存在时，Tier / 邮编库 / DAS 数据按需 fetch（文件名含内容哈希，可永久缓存）
+  const SHARD_LOADS = {};
+  function loadShard(url) {
+    if(!SHARD_LOADS[url]) {
+      SHARD_LOADS[url] = fetch(url).then(r => {
+        if(!r.ok) throw new Error(`${url}: HTTP ${r.status}`);
+        return r.json();
+      });
+    }
+    return SHARD_LOADS[url];
+  }
+  function ensureTier(tier) {
+    DATA.tiers = DATA.tiers || {};
+    if(DATA.tiers[tier] || !DATA.shards || !DATA.shards.tiers[tier]) return Promise.resolve(DATA.tiers[tier]);
+    // Tier 分片只存对共享价格骨架 / 基准矩阵的引用，两者一起到齐后才可用
+    const base = DATA.price_base ? null : loadShard(DATA.shards.price_base).then(d => { DATA.price_base = d; });
+    return Promise.all([loadShard(DATA.shards.tiers[tier]), base]).then(([d]) => (DATA.tiers[tier] = d));
+  }
+  // zip 给出时顺带加载该邮编 3 位前缀的 GOFO 块（分片输出时 GOFO 按前缀分块下载）
+  function ensureZipData(zip) {
+    if(!DATA.shards) return Promise.resolve();
+    const loads = [];
+    if(!DATA.fedex_das_bits && DATA.shards.fedex_das_bits) {
+      loads.push(loadShard(DATA.shards.fedex_das_bits).then(d => { DATA.fedex_das_bits = d; }));
+    }
+    const t = DATA.gofo_zips;
+    const prefix = /^\d{3}/.test(zip || '') ? zip.substring(0, 3) : null;
+    if(prefix && t && t.index[+prefix] === '1' && !t.chunks[prefix] && DATA.shards.gofo_chunks) {
+      loads.push(loadShard(`${DATA.shards.gofo_chunks}${prefix}.json`).then(c => { t.chunks[prefix] = c; }));
+    }
+    return Promise.all(loads);
+  }
+  document.querySelectorAll('input[name="tier"]').forEach(r =>
+    r.addEventListener('change', () => { if(r.checked) ensureTier(r.value); })
+  );
+
+  // FedEx DAS 位图（每类 100,000 位，按邮编数值单比特查询；首次使用时解码）
+  const DAS_BITS = {};
+  const DAS_LABELS = {
+    alaska: "⚠️ FedEx 偏远 (Remote · 阿拉斯加)",
+    hawaii: "⚠️ FedEx 偏远 (Remote · 夏威夷)",
+    remote: "⚠️ FedEx 偏远 (Remote)",
+    extended: "⚠️ FedEx 偏远 (DAS Extended)",
+    contiguous: "⚠️ FedEx 偏远 (DAS)"
+  };
+  function dasBits(cls) {
+    if(!DAS_BITS[cls] && DATA.fedex_das_bits && DATA.fedex_das_bits[cls]) {
+      const bin = atob(DATA.fedex_das_bits[cls]);
+      const bytes = new Uint8Array(bin.length);
+      for(let i = 0; i < bin.length; i++) bytes[i] = bin.charCodeAt(i);
+      DAS_BITS[cls] = bytes;
+    }
+    return DAS_BITS[cls];
+  }
+  function dasHas(cls, zip) {
+    const bits = dasBits(cls);
+    const n = parseInt(zip, 10);
+    return !!bits && (bits[n >> 3] >> (n & 7)) & 1;
+  }
+  function dasClass(zip) {
+    return Object.keys(DAS_LABELS).find(cls => dasHas(cls, zip)) || null;
+  }
+
+  // 1. 邮编双显示
+  function renderLocation(zip) {
+    let html = '';
+    // 邮编上下文（GOFO / 各仓 Zone / DAS）在输入有效邮编时就建好，随后的计算直接复用
+    let ctx = zipContext(zip);
+    if(!('das' in ctx)) ctx.das = dasClass(zip);
+    let g = ctx.gofo;
+    if(g) {
+        html += `<div class="tag-gofo">🟢 [GOFO表] ${g.city}, ${g.state} (${g.cn_state}) - 区:${g.region}</div>`;
+    }
+    let fedexInfo = "通用地区";
+    let das = ctx.das;
+    if(das) fedexInfo = DAS_LABELS[das];
+    html += `<div class="tag-fedex">🔵 [FedEx/通用] ${fedexInfo}</div>`;
+    return `<div class="loc-box">${html}</div>`;
+  }
+
+  document.getElementById('zipCode').addEventListener('input', function() {
+    let zip = this.value.trim();
+    let display = document.getElementById('locDisplay');
+    this.value = this.value.replace(/\D/g, '');
+
+    if(zip.length === 5) {
+        ensureZipData(zip).then(() => {
+            if(this.value.trim() === zip) display.innerHTML = renderLocation(zip);
+        });
+    } else {
+        display.innerHTML = '';
+    }
+  });
+
+  // 2. 燃油初始化
+  ensureTier('T3').then(function initFuel() {
+    let maxFuel = 0;
+    if(DATA.tiers && DATA.tiers.T3) {
+        Object.values(DATA.tiers.T3).forEach(ch => {
+            if(ch.fuel_rate && ch.fuel_rate > maxFuel) maxFuel = ch.fuel_rate;
+        });
+    }
+    if(maxFuel > 0) document.getElementById('fuelInput').value = (maxFuel * 100).toFixed(2);
+  });
+
+  // 4. 规格预检显示
   function updateComplianceUI() {
     let L = parseFloat(document.getElementById('dimL').value)||0;
     let W = parseFloat(document.getElementById('dimW').value)||0;
     let H = parseFloat(document.getElementById('dimH').value)||0;
     let Wt = parseFloat(document.getElementById('weight').value)||0;
-    
+
     if(L > 0 && Wt > 0) {
       let res = checkCompliance({L,W,H,Wt});
       let html = "";
-      
+
       if(res.msgs.length > 0) {
         html += `<li class="fw-bold text-danger">${res.msgs.join(', ')}</li>`;
       }
@@ -368,15 +890,15 @@ HTML_TEMPLATE = r"""
       html += `<li>USPS: ${res.status.usps}</li>`;
       html += `<li>FedEx 标准: ${res.status.fedex_std}</li>`;
       html += `<li>XLmiles: ${res.status.xl}</li>`;
-      
+
       document.getElementById('complianceList').innerHTML = html;
       document.getElementById('complianceBox').style.display = 'block';
     } else {
       document.getElementById('complianceBox').style.display = 'none';
     }
   }
-  
-  ['dimL','dimW','dimH','weight'].forEach(id => 
+
+  ['dimL','dimW','dimH','weight'].forEach(id =>
     document.getElementById(id).addEventListener('input', updateComplianceUI)
   );
 
@@ -388,232 +910,96 @@ HTML_TEMPLATE = r"""
     opt.text = DATA.warehouses[code].name;
     whSelect.appendChild(opt);
   });
-  
+
   whSelect.addEventListener('change', () => {
     document.getElementById('whRegion').innerText = `区域: ${DATA.warehouses[whSelect.value].region}`;
-    document.getElementById('resBody').innerHTML = 
+    document.getElementById('resBody').innerHTML =
       '<tr><td colspan="7" class="text-center py-4 text-muted">仓库已切换，请点击计算</td></tr>';
   });
-  
-  if(whSelect.options.length > 0) whSelect.dispatchEvent(new Event('change'));
 
-  // 6. Zone计算
-  function calcZone(destZip, originZip, conf) {
-    if(!destZip || destZip.length < 3) return 8;
-    
-    let d = parseInt(destZip.substring(0,3));
-    let whRegion = DATA.warehouses[originZip].region;
+  if(whSelect.options.length > 0) whSelect.dispatchEvent(new Event('change'));
 
-    if(conf.zone_source === 'gofo') {
-        if(DATA.gofo_zips && DATA.gofo_zips[destZip]) {
-            let zReg = DATA.gofo_zips[destZip].region; 
-            if(whRegion === 'WEST' && zReg === 'WE') return 2;
-            if(whRegion === 'CENTRAL' && zReg === 'CE') return 2;
-            if(whRegion === 'EAST' && zReg === 'EA') return 2;
-            
-            if(whRegion === 'WEST') {
-                if(zReg === 'CE') return 5;
-                if(zReg === 'EA') return 8;
-            }
-            if(whRegion === 'CENTRAL') {
-                if(zReg === 'WE') return 5;
-                if(zReg === 'EA') return 6;
-            }
-            if(whRegion === 'EAST') {
-                if(zReg === 'WE') return 8;
-                if(zReg === 'CE') return 6;
-            }
-        }
-        return 8;
-    }
-    
-    if(conf.zone_source === 'xlmiles') {
-        const XL_MAP = {
-            '900-935': 2,
-            '936-961': 3, '970-979': 3, '980-994': 3, '995-999': 3,
-            '820-831': 3, '832-838': 3, '890-899': 3,
-            '600-629': 6, '630-699': 6, '700-729': 6, '730-799': 6,
-            '400-599': 6, '000-199': 6, '200-399': 6
-        };
-        
-        for(let range in XL_MAP) {
-            let [start, end] = range.split('-').map(x => parseInt(x));
-            if(d >= start && d <= end) return XL_MAP[range];
-        }
-        return 6;
-    }
+  // 11. 主计算函数
+  function quoteRowHtml(q) {
+    let svcTag = "";
+    if(q.split) svcTag = q.split === 'res' ? '<br><small class="text-info">住宅价格</small>' : '<br><small class="text-success">商业价格</small>';
+    if(q.xl) svcTag = `<br><small class="text-primary">${q.xl}</small>`;
 
-    // 标准FedEx/USPS
-    if(whRegion === 'WEST') {
-      if(d >= 900 && d <= 935) return 2; 
-      if(d >= 936 && d <= 961) return 3;
-      if(d >= 962 && d <= 994) return 4;
-      if(d >= 995 && d <= 999) return 4;
-      if(d >= 800 && d <= 899) return 5;
-      if(d >= 700 && d <= 799) return 6;
-      if(d >= 0 && d <= 199) return 8;
-      return 7;
-    }
-    
-    if(whRegion === 'EAST') {
-      if(d >= 0 && d <= 99) return 2;
-      if(d >= 100 && d <= 199) return 3;
-      if(d >= 200 && d <= 299) return 4; 
-      if(d >= 300 && d <= 499) return 5;
-      if(d >= 500 && d <= 699) return 6;
-      if(d >= 900 && d <= 999) return 8;
-      return 7;
+    let details = [];
+    if(q.res > 0) details.push(`住宅 $${q.res.toFixed(2)}`);
+    if(q.sig > 0) details.push(`签名 $${q.sig.toFixed(2)}`);
+    if(q.fuelRate !== undefined) {
+      let tag = q.fuelMode === 'discount_85' ? " (85折)" : "";
+      details.push(`燃油${tag} ${(q.fuelRate*100).toFixed(2)}%: $${q.fuel.toFixed(2)}`);
+    } else if (q.fuelMode === 'included') {
+      details.push(`<span class="text-success">燃油: 已含</span>`);
     }
-    
-    if(whRegion === 'CENTRAL') {
-       if(d >= 600 && d <= 629) return 2;
-       if(d >= 630 && d <= 659) return 3;
-       if(d >= 400 && d <= 599) return 4;
-       if(d >= 660 && d <= 699) return 5;
-       if(d >= 900 && d <= 999) return 7;
-       if(d >= 0 && d <= 199) return 6;
-       return 5;
-    }
-    
-    return 8;
-  }
 
-  // 7. 输入验证
-  function validateInputs(whCode, zip, pkg) {
-    let errors = [];
-    if(!whCode) errors.push("请选择发货仓库");
-    if(!zip || zip.length !== 5) errors.push("请输入5位邮编");
-    if(pkg.Wt <= 0) errors.push("实重必须大于0");
-    if(pkg.L <= 0 || pkg.W <= 0 || pkg.H <= 0) errors.push("包裹尺寸必须大于0");
-    return errors;
+    return `
+        <tr>
+          <td class="fw-bold text-start">${q.channel}${svcTag}</td>
+          <td><span class="badge bg-light text-dark border">Z${q.zone}</span></td>
+          <td>${q.finalWt.toFixed(q.precision === 1 ? 0 : 1)} lb</td>
+          <td>$${q.base.toFixed(2)}</td>
+          <td class="small text-muted" style="line-height:1.3">${details.join('<br>') || '-'}</td>
+          <td class="text-end price-main">$${q.total.toFixed(2)}</td>
+          <td class="text-center"><span class="status-ok">✔</span></td>
+        </tr>
+      `;
   }
 
-  // 8. 主计算函数
-  document.getElementById('btnCalc').onclick = () => {
-    const whCode = whSelect.value;
-    const tier = document.querySelector('input[name="tier"]:checked').value;
-    const fuelRateInput = parseFloat(document.getElementById('fuelInput').value) || 0;
-    const zip = document.getElementById('zipCode').value.trim();
-    const isRes = document.getElementById('addrType').value === 'res';
-    const sigOn = document.getElementById('sigToggle').checked;
-    
-    const pkg = {
+  function readPackage() {
+    return {
       L: parseFloat(document.getElementById('dimL').value)||0,
       W: parseFloat(document.getElementById('dimW').value)||0,
       H: parseFloat(document.getElementById('dimH').value)||0,
       Wt: parseFloat(document.getElementById('weight').value)||0
     };
+  }
 
+  // 校验输入并加载所需 Tier / 邮编分片；失败时在 errorBox 提示并返回 false
+  async function prepareQuote(whCode, zip, pkg, tiers) {
     const errors = validateInputs(whCode, zip, pkg);
     const errorBox = document.getElementById('errorBox');
-    
+
     if(errors.length > 0) {
       errorBox.innerHTML = `<strong>⚠️ 输入错误：</strong><br>${errors.join('<br>')}`;
       errorBox.style.display = 'block';
-      return;
+      return false;
     }
     errorBox.style.display = 'none';
 
-    document.getElementById('resTierBadge').innerText = tier;
-    let dimWt = (pkg.L * pkg.W * pkg.H) / 222;
-    document.getElementById('pkgInfo').innerHTML = 
-      `<b>Pkg:</b> ${pkg.L}×${pkg.W}×${pkg.H}" | 实重:${pkg.Wt}lb | 体积重:${dimWt.toFixed(2)}lb`;
+    try {
+      await Promise.all([...tiers.map(ensureTier), ensureZipData(zip)]);
+    } catch(e) {
+      errorBox.innerHTML = `<strong>⚠️ 数据加载失败：</strong><br>${e.message}`;
+      errorBox.style.display = 'block';
+      return false;
+    }
+    return true;
+  }
 
-    const tbody = document.getElementById('resBody');
-    tbody.innerHTML = '';
-
-    let comp = checkCompliance(pkg);
-    let hasResults = false;
-
-    Object.keys(DATA.channels).forEach(chName => {
-      const conf = DATA.channels[chName];
-      
-      if(!conf.allow_wh.includes(whCode)) return;
-
-      if(chName.includes("UNIUNI") && comp.status.uniuni.includes("❌")) return;
-      if(chName.includes("USPS") && comp.status.usps.includes("❌")) return;
-      if(chName.includes("XLmiles") && comp.status.xl.includes("❌")) return;
-      if(chName.includes("FedEx") && !chName.includes("超大") && comp.status.fedex_std.includes("❌")) return;
-
-      let rawWt = Math.max(pkg.Wt, dimWt);
-      let precision = conf.weight_precision || 1;
-      let finalWt = Math.ceil(rawWt / precision) * precision;
-
-      let zone = calcZone(zip, whCode, conf);
-      let svcTag = "";
-      let priceList = (DATA.tiers[tier][chName] || {}).prices || [];
-      let basePrice = 0;
-
-      if (chName.includes("XLmiles")) {
-        let xl = getXLService(pkg.L, pkg.W, pkg.H, pkg.Wt);
-        svcTag = `<br><small class="text-primary">${xl.name}</small>`;
-        
-        if(!xl.code) return;
-        
-        let row = priceList.find(r => 
-          r.service === xl.code && 
-          r.w >= finalWt - 0.001 &&
-          r[zone] !== undefined
-        );
-        
-        if(row) basePrice = row[zone] || row[6] || 0;
-      } else {
-        let candidates = priceList.filter(r => r.w >= finalWt - 0.001);
-        if(candidates.length > 0) {
-          candidates.sort((a, b) => a.w - b.w);
-          let row = candidates[0];
-          basePrice = row[zone] || row[8] || 0;
-        }
-      }
-
-      if(basePrice <= 0) return;
-
-      let surcharges = 0;
-      let details = [];
+  document.getElementById('btnCalc').onclick = async () => {
+    const whCode = whSelect.value;
+    const tier = document.querySelector('input[name="tier"]:checked').value;
+    const fuelRateInput = parseFloat(document.getElementById('fuelInput').value) || 0;
+    const zip = document.getElementById('zipCode').value.trim();
+    const isRes = document.getElementById('addrType').value === 'res';
+    const sigOn = document.getElementById('sigToggle').checked;
+    const pkg = readPackage();
 
-      if(isRes && conf.fees.res > 0) {
-        surcharges += conf.fees.res;
-        details.push(`住宅 $${conf.fees.res.toFixed(2)}`);
-      }
-      if(sigOn && conf.fees.sig > 0) {
-        surcharges += conf.fees.sig;
-        details.push(`签名 $${conf.fees.sig.toFixed(2)}`);
-      }
+    if(!(await prepareQuote(whCode, zip, pkg, [tier]))) return;
 
-      if(conf.fuel_mode !== 'none' && conf.fuel_mode !== 'included') {
-        let rate = fuelRateInput / 100;
-        let tag = "";
-        
-        if (conf.fuel_mode === 'discount_85') {
-            rate = rate * 0.85; 
-            tag = " (85折)";
-        }
-        
-        let fuelAmt = (basePrice + surcharges) * rate;
-        surcharges += fuelAmt;
-        details.push(`燃油${tag} ${(rate*100).toFixed(2)}%: $${fuelAmt.toFixed(2)}`);
-      } else if (conf.fuel_mode === 'included') {
-        details.push(`<span class="text-success">燃油: 已含</span>`);
-      }
+    document.getElementById('resTierBadge').innerText = tier;
+    let dimWt = (pkg.L * pkg.W * pkg.H) / 222;
+    document.getElementById('pkgInfo').innerHTML =
+      `<b>Pkg:</b> ${pkg.L}×${pkg.W}×${pkg.H}" | 实重:${pkg.Wt}lb | 体积重:${dimWt.toFixed(2)}lb`;
 
-      let total = basePrice + surcharges;
+    const tbody = document.getElementById('resBody');
+    const quotes = quoteChannels(whCode, tier, zip, pkg, isRes, sigOn, fuelRateInput);
+    tbody.innerHTML = quotes.map(quoteRowHtml).join('');
 
-      tbody.innerHTML += `
-        <tr>
-          <td class="fw-bold text-start">${chName}${svcTag}</td>
-          <td><span class="badge bg-light text-dark border">Z${zone}</span></td>
-          <td>${finalWt.toFixed(precision === 1 ? 0 : 1)} lb</td>
-          <td>$${basePrice.toFixed(2)}</td>
-          <td class="small text-muted" style="line-height:1.3">${details.join('<br>') || '-'}</td>
-          <td class="text-end price-main">$${total.toFixed(2)}</td>
-          <td class="text-center"><span class="status-ok">✔</span></td>
-        </tr>
-      `;
-      
-      hasResults = true;
-    });
-    
-    if(!hasResults) {
+    if(quotes.length === 0) {
         tbody.innerHTML = `
           <tr>
             <td colspan="7" class="text-center py-4 text-danger">
@@ -623,6 +1009,246 @@ HTML_TEMPLATE = r"""
           </tr>`;
     }
   };
+
+  // 12. 全仓对比：行 = 仓库 × 渠道，列 = 客户等级；一次 quoteMatrix 算完，整表一次写入 DOM
+  document.getElementById('btnMatrix').onclick = async () => {
+    const tiers = Object.keys(DATA.shards ? DATA.shards.tiers : DATA.tiers).sort();
+    const fuelRateInput = parseFloat(document.getElementById('fuelInput').value) || 0;
+    const zip = document.getElementById('zipCode').value.trim();
+    const isRes = document.getElementById('addrType').value === 'res';
+    const sigOn = document.getElementById('sigToggle').checked;
+    const pkg = readPackage();
+
+    // 仓库不参与校验：对比本身覆盖全部仓库
+    if(!(await prepareQuote(Object.keys(DATA.warehouses)[0], zip, pkg, tiers))) return;
+
+    const m = quoteMatrix(tiers, zip, pkg, isRes, sigOn, fuelRateInput);
+    const colMin = {};
+    m.rows.forEach(row => tiers.forEach(t => {
+      const q = row.quotes[t];
+      if(q && !(q.total >= colMin[t])) colMin[t] = q.total;
+    }));
+
+    document.getElementById('matrixHead').innerHTML =
+      `<tr><th>仓库</th><th>渠道</th>${tiers.map(t => `<th class="text-end">${t}</th>`).join('')}</tr>`;
+    document.getElementById('matrixBody').innerHTML = m.rows.length === 0
+      ? `<tr><td colspan="${tiers.length + 2}" class="text-center py-3 text-danger">⚠️ 无可用报价</td></tr>`
+      : m.rows.map(row => {
+          const q0 = row.quotes[tiers.find(t => row.quotes[t])];
+          const cells = tiers.map(t => {
+            const q = row.quotes[t];
+            if(!q) return '<td class="text-end text-muted">-</td>';
+            const isBest = m.best.wh === row.wh && m.best.tier === t && m.best.q.channel === row.channel;
+            const cls = (isBest ? ' matrix-best' : '') + (q.total === colMin[t] ? ' fw-bold text-success' : '');
+            return `<td class="text-end${cls}">$${q.total.toFixed(2)}</td>`;
+          }).join('');
+          return `<tr><td>${DATA.warehouses[row.wh].name}</td>` +
+                 `<td>${row.channel} <span class="badge bg-light text-dark border">Z${q0.zone}</span></td>${cells}</tr>`;
+        }).join('');
+    document.getElementById('matrixBest').innerHTML = m.best
+      ? `最低: <b>${DATA.warehouses[m.best.wh].name}</b> · ${m.best.tier} · ${m.best.q.channel} · <b>$${m.best.q.total.toFixed(2)}</b>`
+      : '';
+  };
+
+  // 13. 批量报价：粘贴 CSV / TSV（zip, L, W, H, weight[, res/com]），仓库 / Tier / 燃油 / 签名取左侧表单
+  //     计算在 Worker 中运行报价核心（quoteCore 脚本源码），按块回传进度；不支持 Worker 时在主线程分块计算
+  const BATCH_CHUNK = 500;
+  const BATCH_PREVIEW = 200;
+  let batchWorker = null;
+  let batchCsv = null;
+
+  // 第一行的邮编列和实重列都不含数字时视为表头（zip / 邮编, weight / 实重 ...）；
+  // 其余行尺寸 / 重量不是数字的不丢弃，作为错误行出现在结果里
+  function parseBatchText(text, defaultRes) {
+    let rows = [];
+    text.split(/\r?\n/).forEach(line => {
+      if(!line.trim()) return;
+      const cells = line.split(line.includes('\t') ? '\t' : ',').map(c => c.trim().replace(/^"|"$/g, ''));
+      if(rows.length === 0 && !/\d/.test(cells[0]) && !/\d/.test(cells[4] || '')) return;
+      const nums = cells.slice(1, 5).map(c => c === '' ? NaN : Number(c));
+      const zip = cells[0].replace(/\D/g, '');
+      const addr = (cells[5] || '').toLowerCase();
+      let row = {
+        zip: zip.length > 0 && zip.length < 5 ? zip.padStart(5, '0') : zip,
+        L: nums[0], W: nums[1], H: nums[2], Wt: nums[3],
+        isRes: addr ? !['com', 'commercial', 'business', '商业'].includes(addr) : defaultRes,
+        line: cells
+      };
+      if(cells.length < 5) row.error = "列数不足（需要 邮编, 长, 宽, 高, 实重）";
+      else if(!nums.every(isFinite)) row.error = "尺寸 / 实重不是数字";
+      rows.push(row);
+    });
+    return rows;
+  }
+
+  function htmlText(v) {
+    return String(v).replace(/[&<>"]/g, ch => ({ '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;' })[ch]);
+  }
+
+  function csvCell(v) {
+    v = String(v);
+    return /[",\n]/.test(v) ? `"${v.replace(/"/g, '""')}"` : v;
+  }
+
+  function batchWorkerMain() {
+    self.onmessage = e => {
+      const job = e.data;
+      DATA = job.data;
+      for(let i = 0; i < job.rows.length; i += job.chunk) {
+        const end = Math.min(i + job.chunk, job.rows.length);
+        self.postMessage({ done: end, results: quoteBatchRows(job, i, end) });
+      }
+    };
+  }
+
+  // onChunk 每块调用一次；Worker 内异常 / 消息无法反序列化 / 回退计算出错时调用 onError 一次
+  function startBatchWorker(job, onChunk, onError) {
+    if(batchWorker) { batchWorker.terminate(); batchWorker = null; }
+    let worker = null, url = null;
+    try {
+      const src = `let DATA = null;\n${document.getElementById('quoteCore').textContent}\n(${batchWorkerMain})();`;
+      url = URL.createObjectURL(new Blob([src], { type: 'text/javascript' }));
+      worker = new Worker(url);
+    } catch(e) {
+      worker = null;
+    }
+    // Worker 脚本开始运行（第一条消息）或出错后 Blob URL 就不再需要
+    const release = () => { if(url) { URL.revokeObjectURL(url); url = null; } };
+    if(worker) {
+      batchWorker = worker;
+      const stop = () => {
+        release();
+        worker.terminate();
+        if(batchWorker === worker) batchWorker = null;
+      };
+      worker.onmessage = e => {
+        release();
+        if(e.data.done === job.rows.length) stop();
+        onChunk(e.data);
+      };
+      worker.onerror = e => {
+        e.preventDefault();
+        stop();
+        onError(e.message || 'Worker 运行出错');
+      };
+      worker.onmessageerror = () => {
+        stop();
+        onError('Worker 消息无法解析');
+      };
+      worker.postMessage(job);
+      return;
+    }
+    release();
+    // 回退：主线程分块计算，每块之间让出事件循环，页面保持可响应
+    let i = 0;
+    (function step() {
+      const end = Math.min(i + job.chunk, job.rows.length);
+      let results;
+      try {
+        results = quoteBatchRows(job, i, end);
+      } catch(e) {
+        onError(e.message);
+        return;
+      }
+      onChunk({ done: end, results });
+      i = end;
+      if(i < job.rows.length) setTimeout(step, 0);
+    })();
+  }
+
+  document.getElementById('btnBatch').onclick = async () => {
+    const whCode = whSelect.value;
+    const tier = document.querySelector('input[name="tier"]:checked').value;
+    const rows = parseBatchText(document.getElementById('batchInput').value,
+                                document.getElementById('addrType').value === 'res');
+    const summary = document.getElementById('batchSummary');
+    const bar = document.getElementById('batchBar');
+    const csvBtn = document.getElementById('btnBatchCsv');
+    const runBtn = document.getElementById('btnBatch');
+    csvBtn.disabled = true;
+    batchCsv = null;
+    bar.style.width = '0%';
+    bar.innerText = '';
+    if(rows.length === 0) { summary.innerText = '没有可计算的行'; return; }
+
+    runBtn.disabled = true;
+    try {
+      const prefixes = [...new Set(rows.map(r => r.zip.substring(0, 3)))];
+      await Promise.all([ensureTier(tier), ...prefixes.map(p => ensureZipData(p + '00'))]);
+    } catch(e) {
+      summary.innerText = `数据加载失败：${e.message}`;
+      runBtn.disabled = false;
+      return;
+    }
+
+    // Worker 只拿报价需要的数据：当前 Tier、价格骨架 / 基准、Zone 表、GOFO 块
+    const channels = Object.keys(DATA.channels).filter(ch => DATA.channels[ch].allow_wh.includes(whCode));
+    const job = {
+      data: {
+        channels: DATA.channels, warehouses: DATA.warehouses, zones: DATA.zones,
+        gofo_zips: DATA.gofo_zips, price_base: DATA.price_base, tiers: { [tier]: DATA.tiers[tier] }
+      },
+      rows: rows.map(({ zip, L, W, H, Wt, isRes, error }) => ({ zip, L, W, H, Wt, isRes, error })),
+      whCode, tier, chunk: BATCH_CHUNK,
+      sigOn: document.getElementById('sigToggle').checked,
+      fuelRate: parseFloat(document.getElementById('fuelInput').value) || 0
+    };
+
+    document.getElementById('batchHead').innerHTML =
+      `<tr><th>#</th><th>邮编</th><th>L×W×H</th><th>实重</th><th>地址</th><th>最低价渠道</th><th class="text-end">总费用</th></tr>`;
+    const tbody = document.getElementById('batchBody');
+    tbody.innerHTML = '';
+    const lines = ['﻿' + ['zip', 'L', 'W', 'H', 'weight', 'addr_type', ...channels, 'best_channel', 'best_total', 'error'].map(csvCell).join(',')];
+    const started = performance.now();
+    let quoted = 0;
+
+    startBatchWorker(job, msg => {
+      const from = msg.done - msg.results.length;
+      let html = '';
+      msg.results.forEach((res, k) => {
+        const r = rows[from + k];
+        if(res.best) quoted++;
+        const [, L = '', W = '', H = '', Wt = ''] = r.line.map(htmlText);
+        lines.push([
+          r.zip, ...r.line.slice(1, 5), ...Array(Math.max(0, 5 - r.line.length)).fill(''), r.isRes ? 'res' : 'com',
+          ...channels.map(ch => res.totals && res.totals[ch] !== undefined ? res.totals[ch].toFixed(2) : ''),
+          res.best || '', res.best ? res.bestTotal.toFixed(2) : '', res.error || ''
+        ].map(csvCell).join(','));
+        if(from + k < BATCH_PREVIEW) {
+          html += `<tr><td>${from + k + 1}</td><td>${r.zip}</td><td>${L}×${W}×${H}</td><td>${Wt}</td>` +
+                  `<td>${r.isRes ? '住宅' : '商业'}</td><td>${res.best || `<span class="text-danger">${res.error}</span>`}</td>` +
+                  `<td class="text-end fw-bold">${res.best ? '$' + res.bestTotal.toFixed(2) : '-'}</td></tr>`;
+        }
+      });
+      if(html) tbody.insertAdjacentHTML('beforeend', html);
+
+      const pct = Math.round(msg.done / rows.length * 100);
+      bar.style.width = `${pct}%`;
+      bar.innerText = `${pct}%`;
+      summary.innerText = `${msg.done} / ${rows.length} 行，${quoted} 行有报价`;
+      if(msg.done === rows.length) {
+        summary.innerText += `，用时 ${((performance.now() - started) / 1000).toFixed(2)}s` +
+                             (rows.length > BATCH_PREVIEW ? `（表格仅显示前 ${BATCH_PREVIEW} 行，完整结果请下载 CSV）` : '');
+        batchCsv = lines.join('\r\n');
+        csvBtn.disabled = false;
+        runBtn.disabled = false;
+      }
+    }, message => {
+      bar.style.width = '0%';
+      bar.innerText = '';
+      summary.innerText = `批量计算出错：${message}`;
+      runBtn.disabled = false;
+    });
+  };
+
+  document.getElementById('btnBatchCsv').onclick = () => {
+    if(!batchCsv) return;
+    const a = document.createElement('a');
+    a.href = URL.createObjectURL(new Blob([batchCsv], { type: 'text/csv;charset=utf-8' }));
+    a.download = `batch_quotes_${whSelect.value}_${document.querySelector('input[name="tier"]:checked').value}.csv`;
+    a.click();
+    setTimeout(() => URL.revokeObjectURL(a.href), 1000);
+  };
 </script>
 <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js"></script>
 </body>
@@ -630,21 +1256,198 @@ HTML_TEMPLATE = r"""
 """
 
 # ==========================================
-# 3. 后端处理函数
+# 3. 构建缓存 / 构建报告
 # ==========================================
+# cache_mode: "use" 读写缓存 | "rebuild" 忽略已有缓存并重新写入 | "off" 不读不写
+
+def file_sha256(path):
+    """计算输入文件的内容哈希"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def config_hash(conf):
+    """渠道配置的稳定哈希（配置变化时仅该渠道重新提取）"""
+    raw = json.dumps(conf, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+def cache_load(name, file_hash, cache_mode="use"):
+    """读取某个输入文件的缓存记录；哈希或解析器版本不一致时返回空记录"""
+    if cache_mode != "use":
+        return {}
+    path = os.path.join(CACHE_DIR, f"{name}.pkl")
+    try:
+        with open(path, "rb") as f:
+            record = pickle.load(f)
+    except Exception:
+        return {}
+    if record.get("file_hash") != file_hash or record.get("parser_version") != PARSER_VERSION:
+        return {}
+    return record
+
+def cache_store(name, file_hash, record, cache_mode="use"):
+    """写入缓存记录（先写临时文件再替换，避免并发任务读到半截文件）"""
+    if cache_mode == "off":
+        return
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = os.path.join(CACHE_DIR, f"{name}.pkl")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(dict(record, file_hash=file_hash, parser_version=PARSER_VERSION),
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except Exception as e:
+        print(f"  [Warn] Failed to write cache {name}: {e}")
+
+def cell_text(df, r, c):
+    """单元格的规范化文本（越界为 None），用于版式指纹"""
+    if r >= df.shape[0] or c >= df.shape[1]:
+        return None
+    return str(df.iat[r, c]).strip().lower()
+
+def layout_fingerprint(df, probe):
+    """便宜的结构指纹：列数 + 探针单元格（表头里的重量 / Zone / 邮编等格）的文本"""
+    raw = json.dumps([df.shape[1], [cell_text(df, r, c) for r, c in probe]], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+def layout_path(key):
+    return os.path.join(LAYOUT_DIR, hashlib.sha256(key.encode("utf-8")).hexdigest()[:16] + ".pkl")
+
+def layout_variants(key):
+    try:
+        with open(layout_path(key), "rb") as f:
+            record = pickle.load(f)
+    except Exception:
+        return []
+    if record.get("key") != key or record.get("parser_version") != PARSER_VERSION:
+        return []
+    return record["variants"]
+
+def layout_load(key, df, cache_mode="use"):
+    """返回指纹与当前 Sheet 相符的已记录版式，没有则 None（调用方重新识别）"""
+    if cache_mode != "use":
+        return None
+    for variant in layout_variants(key):
+        if layout_fingerprint(df, variant["probe"]) == variant["fingerprint"]:
+            return variant["layout"]
+    return None
 
-def clean_num(val):
-    """清理数字格式"""
-    if pd.isna(val): return 0.0
-    s = str(val).replace('$', '').replace(',', '').strip()
+def layout_store(key, df, probe, layout, cache_mode="use"):
+    """记录识别出的版式；同一 key 最多保留 LAYOUT_VARIANTS 种（新的在前）"""
+    if cache_mode == "off":
+        return
+    fingerprint = layout_fingerprint(df, probe)
+    variants = [{"fingerprint": fingerprint, "probe": probe, "layout": layout}]
+    variants += [v for v in layout_variants(key) if v["fingerprint"] != fingerprint]
     try:
-        return float(s)
-    except:
-        return 0.0
+        os.makedirs(LAYOUT_DIR, exist_ok=True)
+        path = layout_path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump({"key": key, "parser_version": PARSER_VERSION, "variants": variants[:LAYOUT_VARIANTS]},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except Exception as e:
+        print(f"  [Warn] Failed to write layout cache {key}: {e}")
+
+# 构建报告：records 为各阶段记录；context 为嵌套阶段的标签栈（tier / channel / file 向内继承）
+_REPORT = {"records": [], "context": []}
+
+@contextlib.contextmanager
+def report_stage(stage, **labels):
+    """计时一个构建阶段，块内可往记录里填 rows / cells / bytes 等计数
+
+    tracemalloc 开启时（--profile）另记该阶段相对开始时的内存峰值 peak_mb（含嵌套子阶段）。
+    """
+    parent = _REPORT["context"][-1] if _REPORT["context"] else {}
+    frame = {"labels": dict(parent.get("labels", {}), **labels), "peak": 0}
+    rec = dict(frame["labels"], stage=stage)
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        current, peak = tracemalloc.get_traced_memory()
+        if parent:
+            parent["peak"] = max(parent["peak"], peak)
+        tracemalloc.reset_peak()
+        frame["start_mem"] = current
+    _REPORT["context"].append(frame)
+    t0 = time.perf_counter()
+    try:
+        yield rec
+    finally:
+        rec["seconds"] = round(time.perf_counter() - t0, 6)
+        _REPORT["context"].pop()
+        if tracing:
+            peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+            rec["peak_mb"] = round((peak - frame["start_mem"]) / 1024 / 1024, 3)
+            if parent:
+                parent["peak"] = max(parent["peak"], peak)
+        _REPORT["records"].append(rec)
+
+def report_mark(stage, t0, **counts):
+    """记录函数内部从 t0 起的一段子阶段（标签继承当前阶段，值为 None 的计数不写入）
+
+    只记耗时与计数、不记 peak_mb：t0 是事后传入的，tracemalloc 无法回溯这一段的峰值；
+    子阶段的内存已计入外层 report_stage 的 peak_mb。
+    """
+    labels = _REPORT["context"][-1]["labels"] if _REPORT["context"] else {}
+    counts = {k: v for k, v in counts.items() if v is not None}
+    _REPORT["records"].append(dict(labels, stage=stage, seconds=round(time.perf_counter() - t0, 6), **counts))
+
+def take_report_records():
+    """取出并清空已收集的记录（子进程任务结束时回传给主进程）"""
+    records = _REPORT["records"]
+    _REPORT["records"] = []
+    return records
+
+def summarize_report(records):
+    """按阶段名汇总：次数、耗时合计与各计数合计"""
+    summary = {}
+    for rec in records:
+        agg = summary.setdefault(rec["stage"], {"count": 0, "seconds": 0.0})
+        agg["count"] += 1
+        for key in ("seconds", "rows", "cells", "bytes"):
+            if key in rec:
+                agg[key] = round(agg.get(key, 0) + rec[key], 6)
+        if "peak_mb" in rec:
+            agg["peak_mb"] = max(agg.get("peak_mb", 0), rec["peak_mb"])
+    return summary
+
+def write_build_report(path, records, meta):
+    """写出 JSON 构建报告"""
+    report = dict(meta, stages=records, summary=summarize_report(records))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
 
-def find_sheet_name(xl, keywords, exclude_keywords=None):
+# ==========================================
+# 4. 后端处理函数
+# ==========================================
+
+# 工作簿缓存: {路径: {sheet_name: DataFrame}}，每个 Sheet 只解析一次
+_WORKBOOK_CACHE = {}
+
+def load_workbook(tier_file):
+    """一次性解析整个工作簿（header=None），结果在邮编库/燃油/价格提取之间共享"""
+    path = os.path.join(DATA_DIR, tier_file)
+    if path not in _WORKBOOK_CACHE:
+        with report_stage("read_workbook", file=tier_file) as rec:
+            sheets = pd.read_excel(path, sheet_name=None, header=None)
+            rec["sheets"] = len(sheets)
+            rec["rows"] = sum(df.shape[0] for df in sheets.values())
+            rec["cells"] = sum(int(df.size) for df in sheets.values())
+            rec["bytes"] = os.path.getsize(path)
+        _WORKBOOK_CACHE[path] = sheets
+    return _WORKBOOK_CACHE[path]
+
+def release_workbook(tier_file):
+    """释放已解析的工作簿"""
+    _WORKBOOK_CACHE.pop(os.path.join(DATA_DIR, tier_file), None)
+
+def find_sheet_name(sheets, keywords, exclude_keywords=None):
     """智能查找 Sheet 名称"""
-    for sheet in xl.sheet_names:
+    for sheet in sheets:
         s_upper = sheet.upper().replace(" ", "")
         if not all(k.upper() in s_upper for k in keywords):
             continue
@@ -653,12 +1456,12 @@ def find_sheet_name(xl, keywords, exclude_keywords=None):
         return sheet
     return None
 
-def extract_fuel_rate(xl):
+def extract_fuel_rate(sheets):
     """提取燃油费率 - 修正版"""
-    for sheet in xl.sheet_names:
+    for sheet, df in sheets.items():
         if "MT" in sheet.upper() or "632" in sheet: 
             try:
-                df = pd.read_excel(xl, sheet_name=sheet, header=None, nrows=20)
+                df = df.iloc[:20]
                 
                 for r in range(min(20, df.shape[0])):
                     for c in range(df.shape[1]):
@@ -689,7 +1492,25 @@ def extract_fuel_rate(xl):
                 print(f"  [Warn] Failed to extract fuel from {sheet}: {e}")
     return 0.0
 
-def load_gofo_zip_db(tier_file):
+def detect_gofo_layout(df):
+    """识别 GOFO 邮编表的表头行与各列，返回 (版式, 扫描单元格数)；找不到时版式为 None"""
+    head = np.char.strip(df.iloc[:200].to_numpy(dtype=object).astype(str))
+    header_rows = np.flatnonzero(((head == "目的地邮编") | (head == "GOFO_大区")).any(axis=1))
+    if not len(header_rows):
+        return None, int(head.size)
+    
+    start_row = int(header_rows[0])
+    cols = {}
+    for c, v in enumerate(head[start_row]):
+        if "邮编" in v: cols['zip'] = c
+        elif "城市" in v: cols['city'] = c
+        elif "省州" in v: cols['state'] = c
+        elif "大区" in v: cols['region'] = c
+    if 'zip' not in cols:
+        return None, int(head.size)
+    return {"start_row": start_row, "cols": cols}, int(head.size)
+
+def load_gofo_zip_db(tier_file, cache_mode="use"):
     """加载 GOFO 邮编数据库"""
     db = {}
     path = os.path.join(DATA_DIR, tier_file)
@@ -698,179 +1519,260 @@ def load_gofo_zip_db(tier_file):
         return db
     
     try:
-        xl = pd.ExcelFile(path)
-        sheet_name = find_sheet_name(xl, ["GOFO", "报价"], ["UNIUNI", "MT"])
+        sheets = load_workbook(tier_file)
+        t0 = time.perf_counter()
+        sheet_name = find_sheet_name(sheets, ["GOFO", "报价"], ["UNIUNI", "MT"])
         if not sheet_name:
             print(f"  [Warn] GOFO sheet not found in {tier_file}")
             return db
         
-        df = pd.read_excel(xl, sheet_name=sheet_name, header=None, nrows=8000)
+        df = sheets[sheet_name]
         
-        start_row = -1
-        cols = {}
-        for r in range(min(200, df.shape[0])):
-            row_vals = [str(x).strip() for x in df.iloc[r].values]
-            if "目的地邮编" in row_vals or "GOFO_大区" in row_vals:
-                start_row = r
-                for c, v in enumerate(row_vals):
-                    if "邮编" in v: cols['zip'] = c
-                    elif "城市" in v: cols['city'] = c
-                    elif "省州" in v: cols['state'] = c
-                    elif "大区" in v: cols['region'] = c
-                break
+        layout = layout_load("gofo_zip_db", df, cache_mode)
+        if layout is None:
+            layout, cells = detect_gofo_layout(df)
+            if layout is None:
+                print(f"  [Warn] GOFO table header not found")
+                return db
+            probe = [(layout["start_row"], c) for c in layout["cols"].values()]
+            layout_store("gofo_zip_db", df, probe, layout, cache_mode)
+            report_mark("header_detect", t0, part="gofo_zip_db", cells=cells)
+        else:
+            report_mark("header_detect", t0, part="gofo_zip_db", cached=True)
+        start_row, cols = layout["start_row"], layout["cols"]
         
-        if start_row == -1 or 'zip' not in cols:
-            print(f"  [Warn] GOFO table header not found")
-            return db
+        # 整列处理：邮编规范化 → 过滤非法行 → 州名/大区/中文州名
+        body = df.iloc[start_row+1:]
         
-        for r in range(start_row+1, len(df)):
-            try:
-                raw_zip = str(df.iloc[r, cols['zip']])
-                z = raw_zip.split('.')[0].strip().zfill(5)
-                
-                if len(z) == 5 and z.isdigit():
-                    state = str(df.iloc[r, cols.get('state', -1)]).strip()
-                    db[z] = {
-                        "city": str(df.iloc[r, cols.get('city', -1)]).strip(),
-                        "state": state,
-                        "region": str(df.iloc[r, cols.get('region', -1)]).strip(),
-                        "cn_state": US_STATES_CN.get(state, "")
-                    }
-            except:
-                continue
+        def text_col(key):
+            return pd.Series(body.iloc[:, cols.get(key, -1)].to_numpy(dtype=object).astype(str)).str.strip()
+        
+        zips = text_col('zip').str.split('.', n=1).str[0].str.strip().str.zfill(5)
+        ok = ((zips.str.len() == 5) & zips.str.isdigit()).to_numpy()
+        
+        zips = zips[ok].tolist()
+        cities = text_col('city')[ok].tolist()
+        states = text_col('state')[ok]
+        regions = text_col('region')[ok].tolist()
+        cn_states = states.map(US_STATES_CN).fillna("").tolist()
         
+        db = {
+            z: {"city": city, "state": state, "region": region, "cn_state": cn}
+            for z, city, state, region, cn in zip(zips, cities, states.tolist(), regions, cn_states)
+        }
+        
+        report_mark("gofo_zip_db", t0, rows=len(db), cells=int(body.shape[0]) * len(cols))
         print(f"  [OK] GOFO Zip DB loaded: {len(db)} entries")
     except Exception as e:
         print(f"  [Err] Failed to load GOFO Zip DB: {e}")
     
     return db
 
-def load_fedex_pdf_zips():
-    """加载 FedEx PDF 偏远邮编"""
-    remote_zips = set()
-    extended_zips = set()
+def das_section_key(line):
+    """识别 DAS PDF 的章节标题行，返回章节键（如 "extended"、"move:contiguous>extended"），否则 None"""
+    m = DAS_CHANGE_HEADING_RE.match(line.strip())
+    if m:
+        action = m.group(1).split()[0].lower()
+        src = DAS_SECTION_NAMES.get(m.group(2).upper())
+        dst = DAS_SECTION_NAMES.get((m.group(3) or "").upper())
+        if action == "added" and src:
+            return f"add:{src}"
+        if action == "moved" and src and dst:
+            return f"move:{src}>{dst}"
+        if action == "removed" and src:
+            return f"remove:{src}"
+        return None
+    m = DAS_LIST_HEADING_RE.search(line)
+    if m:
+        return DAS_SECTION_NAMES.get(m.group(1).upper())
+    return None
+
+def extract_pdf_zips(path, timeout=30):
+    """流式读取 pdftotext 输出，逐行收集 5 位邮编（不在内存中拼接整份文本）
+
+    邮编按其所在章节归类；出现在任何章节标题之前的归入 "unclassified"。
+    返回 ({章节键: 邮编集合}, 匹配到的邮编总数)
+    """
+    sections = {}
+    current = "unclassified"
+    count = 0
+    proc = subprocess.Popen(["pdftotext", path, "-"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    timed_out = threading.Event()
     
-    pdf_files = [
-        "FGE_DAS_Contiguous_Extended_Alaska_Hawaii_2025.pdf",
-        "FGE_DAS_Zip_Code_Changes_2025.pdf"
-    ]
+    def kill():
+        timed_out.set()
+        proc.kill()
     
-    for pdf in pdf_files:
-        path = os.path.join(DATA_DIR, pdf)
-        if not os.path.exists(path):
-            continue
-        
-        try:
-            txt = subprocess.check_output(
-                ["pdftotext", path, "-"], 
-                stderr=subprocess.DEVNULL,
-                timeout=30
-            ).decode('utf-8', errors='ignore')
-            
-            zips = re.findall(r'\b\d{5}\b', txt)
-            for z in zips:
-                remote_zips.add(z)
-            
-            print(f"  [OK] Loaded {len(zips)} zips from {pdf}")
-        except FileNotFoundError:
-            print(f"  [Warn] pdftotext not found. Install: apt-get install poppler-utils")
-            break
-        except subprocess.TimeoutExpired:
-            print(f"  [Err] PDF processing timeout: {pdf}")
-        except Exception as e:
-            print(f"  [Err] Failed to process {pdf}: {e}")
+    timer = threading.Timer(timeout, kill)
+    timer.start()
+    try:
+        for line in io.TextIOWrapper(proc.stdout, encoding='utf-8', errors='ignore'):
+            found = ZIP5_RE.findall(line)
+            if found:
+                count += len(found)
+                sections.setdefault(current, set()).update(found)
+            elif "ZIP" in line.upper() or "LIST" in line.upper():
+                current = das_section_key(line) or current
+    finally:
+        timer.cancel()
+        proc.stdout.close()
+        proc.wait()
     
-    return list(remote_zips), list(extended_zips)
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(proc.args, timeout)
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, proc.args)
+    return sections, count
 
-def extract_prices(df, split_side=None, channel_name="", is_residential=None):
+def load_das_pdf(pdf, cache_mode="use"):
+    """加载单个 DAS PDF 的分章节邮编（按 PDF 内容哈希缓存）
+
+    返回 ({章节键: 邮编集合}, 日志行列表)；PDF 不存在或提取失败时为 None。
     """
-    从 DataFrame 提取价格表 - 修正版
+    path = os.path.join(DATA_DIR, pdf)
+    if not os.path.exists(path):
+        return None, []
     
-    参数:
-    - split_side: 'left' 或 'right' 用于左右分割表
-    - channel_name: 渠道名称
-    - is_residential: True/False/None，用于商住分表
+    try:
+        t0 = time.perf_counter()
+        pdf_hash = file_sha256(path)
+        cached = cache_load(pdf, pdf_hash, cache_mode)
+        if "sections" in cached:
+            sections = {k: set(v) for k, v in cached["sections"].items()}
+            total = sum(len(v) for v in sections.values())
+            report_mark("pdf_extract", t0, file=pdf, cached=True, rows=total)
+            return sections, [f"  [Cache] Loaded {total} zips from {pdf}"]
+        
+        sections, count = extract_pdf_zips(path)
+        report_mark("pdf_extract", t0, file=pdf, cached=False, rows=count, bytes=os.path.getsize(path))
+        cache_store(pdf, pdf_hash, {"sections": {k: sorted(v) for k, v in sections.items()}}, cache_mode)
+        return sections, [f"  [OK] Loaded {count} zips from {pdf} ({', '.join(sorted(sections))})"]
+    except FileNotFoundError:
+        return None, [f"  [Warn] pdftotext not found. Install: apt-get install poppler-utils"]
+    except subprocess.TimeoutExpired:
+        return None, [f"  [Err] PDF processing timeout: {pdf}"]
+    except Exception as e:
+        return None, [f"  [Err] Failed to process {pdf}: {e}"]
+
+def load_fedex_pdf_zips(cache_mode="use"):
+    """加载 FedEx DAS 偏远邮编并分类（各 PDF 并发提取）
+
+    以完整列表的章节为准；变更清单（新增 / 迁移 / 移除）只用来核对，
+    与完整列表不一致的邮编打印警告，不改动分类。
+    返回 {分类: 已排序邮编列表}，分类见 DAS_CLASSES。
     """
-    if df is None or df.empty:
-        return []
+    classes = {c: set() for c in DAS_CLASSES}
     
-    # ==========================================
-    # XLmiles 专用解析器
-    # ==========================================
-    if "XLmiles" in channel_name:
-        prices = []
-        h_row = -1
-        z_map = {}
-        
-        for r in range(min(20, df.shape[0])):
-            row_vals = [str(x).lower() for x in df.iloc[r].values]
-            if any("zone" in x for x in row_vals):
-                h_row = r
-                for c, v in enumerate(row_vals):
-                    m = re.search(r'zone\D*(\d+)', v)
-                    if m:
-                        z_map[int(m.group(1))] = c
-                break
-        
-        if h_row == -1 or not z_map:
-            print(f"  [Warn] XLmiles header not found")
-            return []
-        
-        current_service = "AH"
-        
-        for r in range(h_row+1, len(df)):
-            try:
-                svc_raw = str(df.iloc[r, 0]).upper()
-                if "AH" in svc_raw:
-                    current_service = "AH"
-                elif "OS" in svc_raw:
-                    current_service = "OS"
-                elif "OM" in svc_raw:
-                    current_service = "OM"
-                
-                w_raw = str(df.iloc[r, 2])
-                nums = re.findall(r'(\d+(?:\.\d+)?)', w_raw)
-                if not nums:
-                    continue
-                
-                w_val = float(nums[-1])
-                
-                entry = {'service': current_service, 'w': w_val}
-                
-                valid = False
-                for z, c in z_map.items():
-                    p = clean_num(df.iloc[r, c])
-                    if p > 0:
-                        entry[z] = p
-                        valid = True
-                
-                if valid:
-                    prices.append(entry)
-            except:
-                continue
-        
-        print(f"  [OK] XLmiles: {len(prices)} price entries")
-        return prices
+    with report_stage("fedex_das"), ThreadPoolExecutor(max_workers=len(DAS_PDF_FILES)) as pool:
+        results = list(pool.map(lambda pdf: load_das_pdf(pdf, cache_mode), DAS_PDF_FILES))
+    
+    printed = set()
+    changes = []
+    for sections, logs in results:
+        for line in logs:
+            if line not in printed:
+                print(line)
+                printed.add(line)
+        for key, zips in (sections or {}).items():
+            if key in classes:
+                classes[key].update(zips)
+            elif ":" in key:
+                changes.append((key, zips))
+            elif zips:
+                print(f"  [Warn] {len(zips)} DAS zips outside any known section, ignored")
+    
+    for key, zips in changes:
+        action, target = key.split(":")
+        src, _, dst = target.partition(">")
+        if action == "add":
+            stale = zips - classes[src]
+        elif action == "move":
+            stale = (zips - classes[dst]) | (zips & classes[src])
+        else:
+            stale = zips & classes[src]
+        if stale:
+            print(f"  [Warn] DAS change list '{key}' disagrees with the full list for "
+                  f"{len(stale)} zips (e.g. {', '.join(sorted(stale)[:5])}); full list kept")
+    
+    classes["remote"] = classes["alaska"] | classes["hawaii"]
+    return {c: sorted(classes[c]) for c in DAS_CLASSES}
 
-    # ==========================================
-    # 标准渠道解析器
-    # ==========================================
+def encode_zip_bitmap(zips):
+    """把 5 位邮编集合编码成 100,000 位的位图（小端位序），base64 后约 16.7K 字符"""
+    bits = np.zeros(DAS_BITMAP_SIZE, dtype=bool)
+    if zips:
+        bits[np.fromiter((int(z) for z in zips), dtype=np.int64, count=len(zips))] = True
+    return base64.b64encode(np.packbits(bits, bitorder='little').tobytes()).decode("ascii")
+
+def lower_cells(df, max_rows=None):
+    """把 DataFrame（前 max_rows 行）整体转成小写字符串矩阵，供表头/列识别批量匹配"""
+    block = df if max_rows is None else df.iloc[:max_rows]
+    return np.char.lower(block.to_numpy(dtype=object).astype(str))
+
+def cells_contain(cells, *subs):
+    """逐格判断是否包含任一子串，返回布尔矩阵"""
+    mask = np.zeros(cells.shape, dtype=bool)
+    for sub in subs:
+        mask |= np.char.find(cells, sub) >= 0
+    return mask
+
+def clean_num_array(values):
+    """批量清理数字格式：去掉 $ 和千分位后一次性 to_numeric，无法解析的记为 0"""
+    arr = np.asarray(values, dtype=object)
+    flat = pd.Series(arr.ravel())
+    nums = pd.to_numeric(flat, errors='coerce')
+    # 只有带 $ / 千分位等格式的文本单元格才走字符串清理
+    todo = nums.isna() & flat.notna()
+    if todo.any():
+        cleaned = flat[todo].astype(str).str.replace(r'[$,]', '', regex=True).str.strip()
+        nums[todo] = pd.to_numeric(cleaned, errors='coerce')
+    return nums.fillna(0.0).to_numpy(dtype=float).reshape(arr.shape)
+
+def build_price_entries(weights, matrix, zones, valid, services=None):
+    """由重量向量 + Zone 价格矩阵生成价格行（仅保留 >0 的 Zone 价格，按固定小数位取整）"""
+    entries = []
+    rows = np.flatnonzero(valid)
+    weights = np.round(weights, WEIGHT_DECIMALS)
+    matrix = np.round(matrix, PRICE_DECIMALS)
+    svc_list = services[rows].tolist() if services is not None else None
+    for i, (w, vals) in enumerate(zip(weights[rows].tolist(), matrix[rows].tolist())):
+        entry = {'service': svc_list[i]} if svc_list is not None else {}
+        entry['w'] = w
+        for z, p in zip(zones, vals):
+            if p > 0:
+                entry[z] = p
+        entries.append(entry)
+    return entries
+
+def detect_xlmiles_layout(df):
+    """识别 XLmiles 表头：返回 ({h_row, z_map}, 扫描单元格数)；找不到时版式为 None"""
+    head = lower_cells(df, 20)
+    zone_rows = np.flatnonzero(cells_contain(head, "zone").any(axis=1))
+    if len(zone_rows) == 0 or df.shape[1] < 3:
+        return None, int(head.size)
+    
+    h_row = int(zone_rows[0])
+    z_map = {}
+    for c, v in enumerate(head[h_row]):
+        m = re.search(r'zone\D*(\d+)', v)
+        if m:
+            z_map[int(m.group(1))] = c
+    if not z_map:
+        return None, int(head.size)
+    return {"h_row": h_row, "z_map": z_map}, int(head.size)
+
+def detect_price_layout(df, split_side=None, is_residential=None):
+    """识别标准价格表：返回 ({c_start, c_end, h_row, w_col, z_map}, 扫描单元格数)；找不到时版式为 None"""
     total_cols = df.shape[1]
     c_start, c_end = 0, total_cols
+    head = lower_cells(df, 200)
+    cells = int(head.size)
+    has_weight_word = cells_contain(head, '重量', 'weight')
     
     # **修正点1: 只识别lb/oz列，过滤kg列**
     if split_side:
-        weight_cols = []
-        for c in range(total_cols):
-            for r in range(min(50, df.shape[0])):
-                val = str(df.iloc[r, c]).lower()
-                # 只要包含 lb 或 oz 的重量列
-                if ('重量' in val or 'weight' in val) and ('lb' in val or 'oz' in val):
-                    if c not in weight_cols:
-                        weight_cols.append(c)
-                    break
-        
-        weight_cols.sort()
+        lb_oz = has_weight_word[:50] & cells_contain(head[:50], 'lb', 'oz')
+        weight_cols = np.flatnonzero(lb_oz.any(axis=0)).tolist()
         
         if split_side == 'left':
             if len(weight_cols) > 1:
@@ -885,20 +1787,13 @@ def extract_prices(df, split_side=None, channel_name="", is_residential=None):
                 c_end = total_cols
             else:
                 print(f"  [Warn] Right side not found")
-                return []
+                return None, cells
     
     # **修正点2: 商住分表处理**
     if is_residential is not None:
         # 查找商业/住宅的列分隔
-        weight_cols = []
-        for c in range(total_cols):
-            for r in range(min(10, df.shape[0])):
-                val = str(df.iloc[r, c]).lower()
-                if '重量' in val and 'lb' in val:
-                    weight_cols.append(c)
-                    break
-        
-        weight_cols.sort()
+        lb_cells = cells_contain(head[:10], '重量') & cells_contain(head[:10], 'lb')
+        weight_cols = np.flatnonzero(lb_cells.any(axis=0)).tolist()
         
         if len(weight_cols) >= 2:
             if is_residential:
@@ -911,29 +1806,20 @@ def extract_prices(df, split_side=None, channel_name="", is_residential=None):
                 c_end = total_cols
     
     # 查找表头行
-    h_row = -1
-    w_col = -1
-    z_map = {}
-    
-    for r in range(min(200, df.shape[0])):
-        row_vals = [str(x).lower() for x in df.iloc[r, c_start:c_end].values]
-        has_weight = any('weight' in x or '重量' in x for x in row_vals)
-        has_zone = any('zone' in x for x in row_vals)
-        
-        if has_weight and has_zone:
-            h_row = r
-            break
+    region = head[:, c_start:c_end]
+    header_rows = np.flatnonzero(has_weight_word[:, c_start:c_end].any(axis=1) &
+                                 cells_contain(region, 'zone').any(axis=1))
     
-    if h_row == -1:
+    if len(header_rows) == 0:
         print(f"  [Warn] Header row not found")
-        return []
+        return None, cells
     
-    row_dat = df.iloc[h_row]
-    for c in range(c_start, c_end):
-        if c >= total_cols:
-            break
-        
-        val = str(row_dat[c]).strip().lower()
+    h_row = int(header_rows[0])
+    w_col = -1
+    z_map = {}
+    
+    for c in range(c_start, min(c_end, total_cols)):
+        val = head[h_row, c].strip()
         
         if ('weight' in val or '重量' in val) and ('lb' in val or 'oz' in val) and w_col == -1:
             w_col = c
@@ -944,178 +1830,853 @@ def extract_prices(df, split_side=None, channel_name="", is_residential=None):
     
     if w_col == -1 or not z_map:
         print(f"  [Warn] Weight column or zone columns not found")
+        return None, cells
+    return {"c_start": c_start, "c_end": c_end, "h_row": h_row, "w_col": w_col, "z_map": z_map}, cells
+
+def price_layout(df, key, detect, part, cache_mode="use"):
+    """取价格表版式：指纹相符时直接复用已记录的版式，否则调用 detect 重新识别并记录"""
+    t0 = time.perf_counter()
+    layout = layout_load(key, df, cache_mode)
+    if layout is not None:
+        report_mark("header_detect", t0, part=part, cached=True)
+        return layout
+    layout, cells = detect()
+    if layout is not None:
+        probe = [(layout["h_row"], c) for c in [layout.get("w_col", -1)] + list(layout["z_map"].values()) if c >= 0]
+        layout_store(key, df, probe, layout, cache_mode)
+    report_mark("header_detect", t0, part=part, cells=cells)
+    return layout
+
+def extract_prices(df, split_side=None, channel_name="", is_residential=None, cache_mode="use"):
+    """
+    从 DataFrame 提取价格表 - 修正版（按列批量解析）
+    
+    参数:
+    - split_side: 'left' 或 'right' 用于左右分割表
+    - channel_name: 渠道名称
+    - is_residential: True/False/None，用于商住分表
+    - cache_mode: 版式缓存的读写方式（同构建缓存）
+    """
+    if df is None or df.empty:
         return []
     
-    # 提取数据行
-    prices = []
-    for r in range(h_row + 1, len(df)):
-        try:
-            w_raw = df.iloc[r, w_col]
-            w_str = str(w_raw).lower().strip()
-            
-            nums = re.findall(r'[\d\.]+', w_str)
-            if not nums:
-                continue
+    part = split_side or {True: "residential", False: "commercial"}.get(is_residential)
+    key = f"prices:{channel_name}:{part or 'full'}"
+    
+    # ==========================================
+    # XLmiles 专用解析器
+    # ==========================================
+    if "XLmiles" in channel_name:
+        layout = price_layout(df, key, lambda: detect_xlmiles_layout(df), part, cache_mode)
+        if layout is None:
+            print(f"  [Warn] XLmiles header not found")
+            return []
+        
+        t0 = time.perf_counter()
+        h_row, z_map = layout["h_row"], layout["z_map"]
+        body = df.iloc[h_row+1:]
+        
+        # 服务类型：A 列出现 AH/OS/OM 时切换，其余行沿用上一个服务（初始 AH）
+        svc_raw = pd.Series(body.iloc[:, 0].to_numpy(dtype=object).astype(str)).str.upper()
+        svc = np.where(svc_raw.str.contains("AH", regex=False), "AH",
+              np.where(svc_raw.str.contains("OS", regex=False), "OS",
+              np.where(svc_raw.str.contains("OM", regex=False), "OM", None)))
+        services = pd.Series(svc, dtype=object).ffill().fillna("AH").to_numpy()
+        
+        # 重量取 C 列字符串中的最后一个数字（如 "0-50 lbs" → 50）
+        w_raw = pd.Series(body.iloc[:, 2].to_numpy(dtype=object).astype(str))
+        weights = pd.to_numeric(w_raw.str.findall(r'(\d+(?:\.\d+)?)').str[-1], errors='coerce').to_numpy(dtype=float)
+        
+        zones = list(z_map)
+        matrix = clean_num_array(body.iloc[:, list(z_map.values())].to_numpy(dtype=object))
+        valid = ~np.isnan(weights) & (matrix > 0).any(axis=1)
+        
+        prices = build_price_entries(weights, matrix, zones, valid, services)
+        report_mark("row_extract", t0, rows=len(prices), cells=int(body.shape[0]) * (len(zones) + 2))
+        print(f"  [OK] XLmiles: {len(prices)} price entries")
+        return prices
+
+    # ==========================================
+    # 标准渠道解析器
+    # ==========================================
+    layout = price_layout(df, key, lambda: detect_price_layout(df, split_side, is_residential), part, cache_mode)
+    if layout is None:
+        return []
+    
+    t0 = time.perf_counter()
+    h_row, w_col, z_map = layout["h_row"], layout["w_col"], layout["z_map"]
+    
+    # 提取数据行：重量列整列解析（含 oz/kg → lb 换算），价格区一次性转成矩阵
+    body = df.iloc[h_row+1:]
+    body = body[body.iloc[:, w_col].notna().to_numpy()]
+    w_str = pd.Series(body.iloc[:, w_col].to_numpy(dtype=object).astype(str)).str.lower().str.strip()
+    weights = pd.to_numeric(w_str.str.extract(r'([\d\.]+)', expand=False), errors='coerce').to_numpy(dtype=float)
+    weights = np.where(w_str.str.contains('oz', regex=False), weights / 16.0,
+              np.where(w_str.str.contains('kg', regex=False), weights / 0.453592, weights))
+    
+    zones = list(z_map)
+    matrix = clean_num_array(body.iloc[:, list(z_map.values())].to_numpy(dtype=object))
+    valid = (weights > 0) & (matrix > 0).any(axis=1)
+    
+    order = np.argsort(weights, kind='stable')
+    prices = build_price_entries(weights[order], matrix[order], zones, valid[order])
+    report_mark("row_extract", t0, part=part, rows=len(prices), cells=int(body.shape[0]) * (len(zones) + 1))
+    print(f"  [OK] {channel_name or 'Standard'}: {len(prices)} price entries")
+    return prices
+
+# ==========================================
+# 5. 构建任务与调度
+# ==========================================
+
+def extract_channel(sheets, ch_key, conf, fuel_rate, cache_mode="use"):
+    """提取单个渠道的价格数据；Sheet 缺失或提取失败时返回 None"""
+    sheet = find_sheet_name(sheets, conf["keywords"], conf.get("exclude"))
+    
+    if not sheet:
+        print(f"  [Skip] {ch_key}: Sheet not found")
+        return None
+    
+    try:
+        df = sheets[sheet]
+        ch_fuel = fuel_rate if conf.get("fuel_mode") in ["standard", "discount_85"] else 0
+        
+        # **修正点3: 商住分表处理**
+        if conf.get("has_res_com_split"):
+            # 生成两套价格表
+            prices_res = extract_prices(
+                df, 
+                split_side=None,
+                channel_name=ch_key, 
+                is_residential=True,
+                cache_mode=cache_mode
+            )
+            prices_com = extract_prices(
+                df, 
+                split_side=None,
+                channel_name=ch_key, 
+                is_residential=False,
+                cache_mode=cache_mode
+            )
             
-            w_val = float(nums[0])
+            if prices_res and prices_com:
+                print(f"  [OK] {ch_key}: Res={len(prices_res)}, Com={len(prices_com)} rows")
+                return {
+                    "prices_residential": prices_res,
+                    "prices_commercial": prices_com,
+                    "fuel_rate": ch_fuel
+                }
+            print(f"  [Warn] {ch_key}: Commercial/Residential split failed")
+        else:
+            # 标准单表
+            prices = extract_prices(
+                df, 
+                split_side=conf.get("sheet_side"), 
+                channel_name=ch_key,
+                cache_mode=cache_mode
+            )
             
-            # 单位转换
-            if 'oz' in w_str:
-                w_val /= 16.0
-            elif 'kg' in w_str:
-                w_val /= 0.453592
+            if prices:
+                print(f"  [OK] {ch_key}: {len(prices)} rows")
+                return {"prices": prices, "fuel_rate": ch_fuel}
+            print(f"  [Warn] {ch_key}: No valid prices extracted")
+    
+    except Exception as e:
+        print(f"  [Err] {ch_key}: {e}")
+    return None
+
+def process_tier(tier, filename, load_zip_db=False, cache_mode="use"):
+    """提取单个 Tier 的全部渠道价格（可在子进程中独立运行）
+
+    load_zip_db=True 时顺带从同一工作簿加载 GOFO 邮编库，保证工作簿只解析一次。
+    缓存按文件哈希 + 渠道配置哈希命中；全部命中时不打开工作簿，否则只重新提取失效的部分。
+    返回 {"tier_data": ..., "zip_db": ...}；文件不存在时返回 None。
+    """
+    with report_stage("process_tier", tier=tier, file=filename):
+        return _process_tier(tier, filename, load_zip_db, cache_mode)
+
+def _process_tier(tier, filename, load_zip_db, cache_mode):
+    """process_tier 的实现（构建报告计时由 process_tier 包裹）"""
+    print(f"\n--- Processing {tier} ({filename}) ---")
+    path = os.path.join(DATA_DIR, filename)
+    
+    if not os.path.exists(path):
+        print(f"  [Warn] File not found: {filename}")
+        return None
+    
+    file_hash = file_sha256(path)
+    cached = cache_load(filename, file_hash, cache_mode)
+    cached_channels = cached.get("channels", {})
+    conf_hashes = {ch_key: config_hash(conf) for ch_key, conf in CHANNEL_CONFIG.items()}
+    stale = [ch_key for ch_key, h in conf_hashes.items()
+             if cached_channels.get(ch_key, {}).get("conf_hash") != h]
+    need_zip_db = load_zip_db and "zip_db" not in cached
+    
+    fuel_rate = cached.get("fuel_rate")
+    zip_db = cached.get("zip_db") if load_zip_db else None
+    channels = {ch_key: cached_channels[ch_key] for ch_key in conf_hashes if ch_key not in stale}
+    
+    if not stale and not need_zip_db and fuel_rate is not None:
+        print(f"  [Cache] {tier}: {len(channels)} channels unchanged, workbook not opened")
+    else:
+        try:
+            sheets = load_workbook(filename)
             
-            if w_val <= 0:
-                continue
+            if need_zip_db:
+                zip_db = load_gofo_zip_db(filename, cache_mode)
             
-            entry = {'w': w_val}
-            valid = False
+            if fuel_rate is None:
+                with report_stage("fuel_rate"):
+                    fuel_rate = extract_fuel_rate(sheets)
+                if fuel_rate > 0:
+                    print(f"  [OK] Fuel rate detected: {fuel_rate*100:.2f}%")
             
-            for z, c in z_map.items():
-                p = clean_num(df.iloc[r, c])
-                if p > 0:
-                    entry[z] = p
-                    valid = True
+            for ch_key in stale:
+                with report_stage("extract_channel", channel=ch_key) as rec:
+                    entry = extract_channel(sheets, ch_key, CHANNEL_CONFIG[ch_key], fuel_rate, cache_mode)
+                    rec["rows"] = sum(len(v) for k, v in (entry or {}).items() if k.startswith("prices"))
+                channels[ch_key] = {"conf_hash": conf_hashes[ch_key], "entry": entry}
             
-            if valid:
-                prices.append(entry)
-        except:
-            continue
+            record = {"fuel_rate": fuel_rate, "channels": channels}
+            if zip_db is not None:
+                record["zip_db"] = zip_db
+            elif "zip_db" in cached:
+                record["zip_db"] = cached["zip_db"]
+            cache_store(filename, file_hash, record, cache_mode)
+        
+        except Exception as e:
+            print(f"  [Err] Failed to process {filename}: {e}")
+        finally:
+            release_workbook(filename)
     
-    prices.sort(key=lambda x: x['w'])
-    print(f"  [OK] {channel_name or 'Standard'}: {len(prices)} price entries")
-    return prices
+    tier_data = {}
+    for ch_key in CHANNEL_CONFIG:
+        entry = channels.get(ch_key, {}).get("entry")
+        if entry is not None:
+            tier_data[ch_key] = entry
+    
+    return {"tier_data": tier_data, "zip_db": zip_db}
 
-# ==========================================
-# 4. 主流程
-# ==========================================
+def _run_captured(func, args):
+    """在子进程中运行任务并收集其输出与构建报告记录，由主进程按固定顺序打印 / 合并"""
+    buf = io.StringIO()
+    take_report_records()
+    with contextlib.redirect_stdout(buf):
+        result = func(*args)
+    return result, buf.getvalue(), take_report_records()
 
-def main():
-    """主生成流程"""
-    if not os.path.exists(OUTPUT_DIR):
-        os.makedirs(OUTPUT_DIR)
+def run_build_tasks(tasks, jobs=1):
+    """按依赖关系调度构建任务
+
+    tasks: [(name, func, args, deps), ...]，依赖任务的结果按 deps 顺序追加到 args 之后。
+    jobs > 1 时就绪任务并发提交到进程池；日志按任务声明顺序输出，结果与串行执行一致。
+    返回 {name: result}
+    """
+    pending = {name: (func, args, deps) for name, func, args, deps in tasks}
+    results = {}
     
-    print("=" * 60)
-    print("🚀 Starting Generation (V2026.2.1 Data Fix)")
-    print("=" * 60)
+    def ready():
+        return [n for n, (_, _, deps) in pending.items() if all(d in results for d in deps)]
+    
+    if jobs <= 1:
+        while pending:
+            names = ready()
+            if not names:
+                raise RuntimeError(f"Unresolvable task dependencies: {sorted(pending)}")
+            func, args, deps = pending.pop(names[0])
+            results[names[0]] = func(*args, *(results[d] for d in deps))
+        return results
     
-    print("\n[1/3] Loading GOFO Zip Database...")
-    zip_db = load_gofo_zip_db("T0.xlsx")
+    logs = {}
+    records = {}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        running = {}
+        while pending or running:
+            for name in ready():
+                func, args, deps = pending.pop(name)
+                fut = pool.submit(_run_captured, func, tuple(args) + tuple(results[d] for d in deps))
+                running[fut] = name
+            if not running:
+                raise RuntimeError(f"Unresolvable task dependencies: {sorted(pending)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = running.pop(fut)
+                results[name], logs[name], records[name] = fut.result()
     
-    print("\n[2/3] Loading FedEx DAS Zips...")
-    fedex_remote, fedex_extended = load_fedex_pdf_zips()
+    for name, _, _, _ in tasks:
+        print(logs[name], end="")
+        _REPORT["records"].extend(records[name])
+    return results
+
+def build_tasks(cache_mode="use"):
+    """声明构建任务：FedEx PDF 与各 Tier 互相独立；邮编库随 ZIP_DB_TIER 一起加载"""
+    tasks = [("fedex_das", load_fedex_pdf_zips, (cache_mode,), ())]
+    for tier, filename in TIER_FILES.items():
+        tasks.append((f"tier:{tier}", process_tier, (tier, filename, tier == ZIP_DB_TIER, cache_mode), ()))
+    return tasks
+
+def build_final_data(cache_mode="use", jobs=1):
+    """运行全部构建任务并合并为 final_data（Python 侧的完整数据，未做页面编码）"""
+    tasks = build_tasks(cache_mode)
+    print(f"\n[1/2] Extracting FedEx DAS Zips, GOFO Zip DB & Price Tables ({len(tasks)} tasks, jobs={jobs})...")
+    results = run_build_tasks(tasks, jobs=jobs)
     
-    print("\n[3/3] Processing Price Tables...")
+    print("\n[2/2] Merging results...")
+    zip_db = {}
+    tiers = {}
     
-    final_data = {
+    # 按 TIER_FILES 顺序合并，保证输出与执行顺序无关
+    for tier in TIER_FILES:
+        res = results[f"tier:{tier}"]
+        if res is None:
+            continue
+        if res["zip_db"] is not None:
+            zip_db = res["zip_db"]
+        tiers[tier] = res["tier_data"]
+    
+    return {
         "warehouses": WAREHOUSE_DB,
         "channels": CHANNEL_CONFIG,
         "gofo_zips": zip_db,
-        "fedex_das_remote": fedex_remote,
-        "fedex_das_extended": fedex_extended,
-        "tiers": {}
+        "fedex_das": results["fedex_das"],
+        "tiers": tiers
     }
 
-    for tier, filename in TIER_FILES.items():
-        print(f"\n--- Processing {tier} ({filename}) ---")
-        path = os.path.join(DATA_DIR, filename)
-        
+# ==========================================
+# 6. 页面数据编码
+# ==========================================
+
+def dump_json(obj):
+    """页面数据统一的 JSON 序列化（NaN / Infinity 已在 build_page_data 中清理，这里遇到即报错）"""
+    return json.dumps(obj, ensure_ascii=False, indent=None, allow_nan=False)
+
+def iter_json(obj, depth=3):
+    """分段产生与 dump_json 相同的 JSON 文本
+
+    前 depth 层的 dict（以及元素为容器的 list）逐项展开，其余值整段交给 C 编码器；
+    写文件时内存里只有当前这一段，而不是整份页面数据的字符串。
+    """
+    if depth > 0 and isinstance(obj, dict):
+        yield "{"
+        for i, (k, v) in enumerate(obj.items()):
+            yield (", " if i else "") + json.dumps(str(k), ensure_ascii=False) + ": "
+            yield from iter_json(v, depth - 1)
+        yield "}"
+    elif depth > 0 and isinstance(obj, list) and obj and isinstance(obj[0], (dict, list)):
+        yield "["
+        for i, v in enumerate(obj):
+            if i:
+                yield ", "
+            yield from iter_json(v, depth - 1)
+        yield "]"
+    else:
+        yield dump_json(obj)
+
+def write_html(f, page_data):
+    """模板前半 → 页面数据 JSON（分段写入 f）→ 模板后半；返回写入的字符数
+
+    数据写在 <script type="application/json"> 数据岛里，"<" 一律转义成 \\u003c，
+    字符串里的 "</script>" / "<!--" 不会提前结束脚本块（JSON.parse 结果不变）。
+    """
+    prefix, suffix = HTML_TEMPLATE.split('__JSON_DATA__', 1)
+    size = f.write(prefix)
+    for chunk in iter_json(page_data):
+        size += f.write(chunk.replace("<", "\\u003c"))
+    return size + f.write(suffix)
+
+def finite_numbers(obj):
+    """递归把 NaN / ±Infinity 替换成 0（页面按 0 = 无值处理）"""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else 0
+    if isinstance(obj, dict):
+        return {k: finite_numbers(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [finite_numbers(v) for v in obj]
+    return obj
+
+def compact_numbers(arr):
+    """数值数组 → 列表，整数值写成 int（0 而不是 0.0）"""
+    return [int(v) if v.is_integer() else v for v in arr.tolist()]
+
+def base36_width(n):
+    """编码 0..n-1 所需的 36 进制位数（至少 1 位）"""
+    return len(np.base_repr(max(n - 1, 0), 36))
+
+def encode_zip_table(zip_db):
+    """GOFO 邮编库按 3 位前缀分块编码，页面只在查到该前缀时才解码（分片输出时才下载）
+
+    states / regions / cn_states 为全局字典（cn_states 与 states 一一对应）；
+    chunks[前缀] = {"cities": 块内城市字典, "rec": 记录串}，每条记录为邮编后两位 +
+    城市 / 州 / 大区编码（定宽 36 进制，宽度见 widths）；index 为 1000 位的前缀存在标记。
+    """
+    states, regions = {}, {}
+    blocks = {}
+    for z in sorted(zip_db):
+        rec = zip_db[z]
+        block = blocks.setdefault(z[:3], {"cities": {}, "rows": []})
+        block["rows"].append((
+            z[3:],
+            block["cities"].setdefault(rec["city"], len(block["cities"])),
+            states.setdefault(rec["state"], len(states)),
+            regions.setdefault(rec["region"], len(regions))
+        ))
+    widths = [
+        base36_width(max((len(b["cities"]) for b in blocks.values()), default=1)),
+        base36_width(len(states)),
+        base36_width(len(regions))
+    ]
+    chunks = {}
+    for prefix, block in blocks.items():
+        rec = "".join(
+            suffix + "".join(np.base_repr(code, 36).rjust(w, "0") for code, w in zip(codes, widths))
+            for suffix, *codes in block["rows"]
+        )
+        chunks[prefix] = {"cities": list(block["cities"]), "rec": rec}
+    index = ["0"] * 1000
+    for prefix in chunks:
+        index[int(prefix)] = "1"
+    return {
+        "states": list(states),
+        "cn_states": [US_STATES_CN.get(st, "") for st in states],
+        "regions": list(regions),
+        "widths": widths,
+        "index": "".join(index),
+        "chunks": chunks
+    }
+
+def parse_zip_range(rng):
+    """'900-935' → (900, 935)"""
+    start, end = rng.split('-')
+    return int(start), int(end)
+
+def compile_prefix_zones(ranges, default):
+    """把 [(区间, zone), ...]（按顺序首个命中）编译成 1000 项的 3 位前缀 → Zone 数组"""
+    table = [None] * 1000
+    for rng, zone in ranges:
+        start, end = parse_zip_range(rng)
+        for d in range(start, end + 1):
+            if table[d] is None:
+                table[d] = zone
+    return [default if z is None else z for z in table]
+
+def compile_zone_tables():
+    """编译全部 Zone 查找表：{zone_source: {仓库大区: 1000 项 Zone 数组}} + GOFO 大区矩阵"""
+    general = {}
+    xlmiles = {}
+    xl_table = compile_prefix_zones(XLMILES_ZONE_MAP.items(), XLMILES_DEFAULT_ZONE)
+    for region, zone_map in GENERAL_ZONE_MAP.items():
+        general[region] = compile_prefix_zones(zone_map.items(), GENERAL_DEFAULT_ZONE[region])
+        # XLmiles 只从 91730 发货，各大区共用同一张表
+        xlmiles[region] = xl_table
+    return {
+        "general": general,
+        "xlmiles": xlmiles,
+        "gofo": GOFO_REGION_ZONES,
+        "gofo_default": GOFO_DEFAULT_ZONE,
+        "fallback": FALLBACK_ZONE
+    }
+
+def encode_zone_tables(tables):
+    """页面编码：每张 1000 项的表压成 1000 个数字字符（Zone 均为个位数）"""
+    page = dict(tables)
+    for source in ("general", "xlmiles"):
+        page[source] = {}
+        for region, table in tables[source].items():
+            assert all(0 <= z <= 9 for z in table), f"zone out of range in {source}/{region}"
+            page[source][region] = "".join(str(z) for z in table)
+    return page
+
+def encode_price_table(rows):
+    """价格行 → 稠密矩阵编码 {"w": 重量向量, "zones": Zone 表头, "m": 行优先价格矩阵}
+
+    m 共 len(w) × len(zones) 项，0 表示该档位在该 Zone 无价；页面把 w / m 转成定型数组。
+    """
+    zones = sorted({k for r in rows for k in r if k not in ("w", "service")}, key=int)
+    col = {z: j for j, z in enumerate(zones)}
+    matrix = np.zeros((len(rows), len(zones)))
+    for i, r in enumerate(rows):
+        for k, p in r.items():
+            j = col.get(k)
+            if j is not None:
+                matrix[i, j] = p
+    matrix = np.round(np.nan_to_num(matrix, nan=0.0, posinf=0.0, neginf=0.0), PRICE_DECIMALS)
+    weights = np.round(np.nan_to_num(np.array([r["w"] for r in rows], dtype=float)), WEIGHT_DECIMALS)
+    return {
+        "w": compact_numbers(weights),
+        "zones": [int(z) for z in zones],
+        "m": compact_numbers(matrix.ravel())
+    }
+
+def index_price_tables(entry):
+    """页面查价索引：各价格表按重量稳定排序后做稠密编码，页面用二分查找档位
+
+    带 service 的表（XLmiles）先按服务分组再排序，service_ranges 给出
+    {表名: {服务: [起, 止)}}，页面只在对应区间内查找。
+    """
+    page = dict(entry)
+    ranges = {}
+    for key in ("prices", "prices_residential", "prices_commercial"):
+        rows = entry.get(key)
+        if not rows:
+            continue
+        if any("service" in r for r in rows):
+            services = list(dict.fromkeys(r.get("service") for r in rows))
+            rows = sorted(rows, key=lambda r: (services.index(r.get("service")), r["w"]))
+            ranges[key] = {}
+            for i, r in enumerate(rows):
+                ranges[key].setdefault(r.get("service"), [i, i])[1] = i + 1
+        else:
+            rows = sorted(rows, key=lambda r: r["w"])
+        page[key] = encode_price_table(rows)
+    if ranges:
+        page["service_ranges"] = ranges
+    return page
+
+def js_round(values, decimals):
+    """与页面 Math.round(v * 10^n) / 10^n 逐位一致的取整（round half up）"""
+    scale = 10.0 ** decimals
+    y = np.asarray(values, dtype=float) * scale
+    r = np.floor(y)
+    r += (y - r) >= 0.5
+    return r / scale
+
+def multiplier_candidates(base, m):
+    """由最大价格格推测整体倍数：[(k, 乘后取整小数位), ...]"""
+    i = int(np.argmax(base))
+    if base[i] <= 0 or m[i] <= 0:
+        return []
+    ratio = m[i] / base[i]
+    ks = dict.fromkeys(round(ratio, digits) for digits in (2, 3, 4))
+    return [(k, kd) for k in ks if k != 1 for kd in (2, PRICE_DECIMALS)]
+
+def dedup_price_tables(tiers):
+    """跨 Tier / 商住价格表去重
+
+    重量向量 + Zone 表头（骨架）只存一份；价格矩阵与同骨架的已有基准矩阵比较：
+    逐项相等 → 直接引用；为基准 × k 按 kd 位取整 → 记 k / kd；与上述近似仍有少数格
+    不同 → 再记稀疏差值 di/dv；都不划算时自身成为新的基准矩阵。
+    返回 (tiers, price_base)，页面按需还原，还原结果与 m 逐项相等（已按 js_round 校验）。
+    """
+    skeletons, skel_index = [], {}
+    bases, by_skel = [], {}
+    
+    def encode(table):
+        key = (tuple(table["w"]), tuple(table["zones"]))
+        s = skel_index.get(key)
+        if s is None:
+            s = skel_index[key] = len(skeletons)
+            skeletons.append({"w": table["w"], "zones": table["zones"]})
+        m = np.asarray(table["m"], dtype=float)
+        best = None
+        for b in by_skel.get(s, []):
+            base = bases[b]
+            approxes = [(base, {})] + [
+                (js_round(base * k, kd), {"k": k, "kd": kd}) for k, kd in multiplier_candidates(base, m)
+            ]
+            for approx, extra in approxes:
+                diff = np.flatnonzero(approx != m)
+                if len(diff) == 0:
+                    return dict({"s": s, "b": b}, **extra)
+                if best is None or len(diff) < len(best[3]):
+                    best = (b, approx, extra, diff)
+        # 差值按 (下标, 值) 成对存储，只在明显小于整张矩阵时采用
+        if best is not None and 2 * len(best[3]) < m.size:
+            b, approx, extra, diff = best
+            dv = np.round(m[diff] - approx[diff], PRICE_DECIMALS)
+            if np.array_equal(js_round(approx[diff] + dv, PRICE_DECIMALS), m[diff]):
+                return dict({"s": s, "b": b}, **extra, di=diff.tolist(), dv=compact_numbers(dv))
+        by_skel.setdefault(s, []).append(len(bases))
+        bases.append(m)
+        return {"s": s, "b": len(bases) - 1}
+    
+    out = {}
+    for tier, tier_data in tiers.items():
+        out[tier] = {}
+        for ch, entry in tier_data.items():
+            entry = dict(entry)
+            for key in ("prices", "prices_residential", "prices_commercial"):
+                if entry.get(key):
+                    entry[key] = encode(entry[key])
+            out[tier][ch] = entry
+    price_base = {
+        "decimals": PRICE_DECIMALS,
+        "skeletons": skeletons,
+        "bases": [compact_numbers(m) for m in bases]
+    }
+    return out, price_base
+
+def build_page_data(final_data):
+    """把 final_data 转成页面内嵌的 DATA 结构"""
+    page = {k: v for k, v in final_data.items() if k != "fedex_das"}
+    page["tiers"], page["price_base"] = dedup_price_tables({
+        tier: {ch: index_price_tables(entry) for ch, entry in tier_data.items()}
+        for tier, tier_data in final_data["tiers"].items()
+    })
+    page["gofo_zips"] = encode_zip_table(final_data["gofo_zips"])
+    page["zones"] = encode_zone_tables(compile_zone_tables())
+    page["fedex_das_bits"] = {c: encode_zip_bitmap(zips) for c, zips in final_data["fedex_das"].items()}
+    return finite_numbers(page)
+
+def write_shards(page_data, out_dir=OUTPUT_DIR):
+    """分片输出：公共部分（仓库、渠道）留在页面内，各 Tier / 邮编库 / DAS 写成带内容哈希的 JSON
+
+    GOFO 邮编库的字典与前缀索引留在页面内，各 3 位前缀块写到 gofo-<哈希>/<前缀>.json，
+    哈希取自全部块，页面按 shards.gofo_chunks + 前缀拼出 URL。
+    返回页面内嵌的核心数据，其中 shards 记录各分片的相对 URL；旧分片由 write_page 在换页后清理。
+    """
+    shard_dir = os.path.join(out_dir, SHARD_DIR)
+    os.makedirs(shard_dir, exist_ok=True)
+    
+    core = {k: v for k, v in page_data.items()
+            if k not in ("tiers", "price_base", "gofo_zips", "fedex_das_bits")}
+    core["shards"] = {"tiers": {}}
+    written = set()
+    
+    def emit(name, obj):
+        t0 = time.perf_counter()
+        raw = dump_json(obj).encode("utf-8")
+        fname = f"{name}.{hashlib.sha256(raw).hexdigest()[:12]}.json"
+        path = os.path.join(shard_dir, fname)
         if not os.path.exists(path):
-            print(f"  [Warn] File not found: {filename}")
+            # 先写临时文件再改名：构建中途被杀不会留下截断的分片（同名文件存在即跳过，截断后永远不会重写）
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(raw)
+            os.replace(tmp, path)
+        written.add(fname)
+        report_mark("write_shard", t0, file=fname, bytes=len(raw))
+        print(f"   Shard: {SHARD_DIR}/{fname} ({len(raw)/1024:.1f} KB)")
+        return f"{SHARD_DIR}/{fname}"
+    
+    core["shards"]["price_base"] = emit("price-base", page_data["price_base"])
+    for tier, tier_data in page_data["tiers"].items():
+        core["shards"]["tiers"][tier] = emit(f"tier-{tier}", tier_data)
+    core["shards"]["fedex_das_bits"] = emit("fedex-das", page_data["fedex_das_bits"])
+    
+    t0 = time.perf_counter()
+    chunks = {p: dump_json(c).encode("utf-8") for p, c in page_data["gofo_zips"]["chunks"].items()}
+    digest = hashlib.sha256()
+    for prefix, raw in chunks.items():
+        digest.update(prefix.encode("ascii") + raw)
+    chunk_dir = f"gofo-{digest.hexdigest()[:12]}"
+    if not os.path.isdir(os.path.join(shard_dir, chunk_dir)):
+        tmp_dir = os.path.join(shard_dir, f"{chunk_dir}.{os.getpid()}.tmp")
+        os.makedirs(tmp_dir)
+        for prefix, raw in chunks.items():
+            with open(os.path.join(tmp_dir, f"{prefix}.json"), "wb") as f:
+                f.write(raw)
+        os.replace(tmp_dir, os.path.join(shard_dir, chunk_dir))
+    written.add(chunk_dir)
+    size = sum(len(raw) for raw in chunks.values())
+    report_mark("write_shard", t0, file=chunk_dir, rows=len(chunks), bytes=size)
+    print(f"   Shard: {SHARD_DIR}/{chunk_dir}/ ({len(chunks)} prefixes, {size/1024:.1f} KB)")
+    core["gofo_zips"] = dict(page_data["gofo_zips"], chunks={})
+    core["shards"]["gofo_chunks"] = f"{SHARD_DIR}/{chunk_dir}/"
+    return core
+
+def page_shard_refs(html_path):
+    """读已生成的 index.html，返回其数据岛 shards 引用的 shards/ 下条目名（文件名或 gofo-<哈希> 目录名）
+
+    页面不存在、不是分片输出（无 shards）或数据岛无法解析时返回空集合。
+    """
+    marker = '<script id="quoteData" type="application/json">'
+    try:
+        with open(html_path, encoding="utf-8") as f:
+            html = f.read()
+        start = html.index(marker) + len(marker)
+        shards = json.loads(html[start:html.index("</script>", start)]).get("shards") or {}
+    except (OSError, ValueError):
+        return set()
+    urls = list(shards.get("tiers", {}).values())
+    urls += [shards[k] for k in ("price_base", "fedex_das_bits", "gofo_chunks") if shards.get(k)]
+    return {url[len(SHARD_DIR) + 1:].split("/")[0] for url in urls if url.startswith(f"{SHARD_DIR}/")}
+
+def sweep_shards(shard_dir, keep):
+    """删除 shards/ 下不在 keep 中的分片文件、gofo-* 目录和中断构建留下的 .tmp"""
+    for fname in os.listdir(shard_dir):
+        if fname in keep:
             continue
-        
-        tier_data = {}
-        
+        path = os.path.join(shard_dir, fname)
+        if os.path.isdir(path):
+            if fname.startswith("gofo-"):
+                shutil.rmtree(path)
+        elif fname.endswith((".json", ".tmp")):
+            os.remove(path)
+
+# ==========================================
+# 7. 主流程
+# ==========================================
+
+def write_page(final_data, split_output=False):
+    """final_data → 页面编码 →（分片）→ 流式写 index.html（先写临时文件再替换，浏览器不会读到半截页面）
+
+    分片输出时，换页之后才清理旧分片，并保留被替换页面引用的上一代分片：已打开或被浏览器 / CDN
+    缓存的旧页面在 --watch 重建后仍能加载分片。非分片输出时删除旧的 shards/ 目录。
+    返回 (输出路径, 字节数)
+    """
+    with report_stage("page_encode"):
+        page_data = build_page_data(final_data)
+    if split_output:
+        with report_stage("write_shards"):
+            page_data = write_shards(page_data, OUTPUT_DIR)
+    
+    output_path = os.path.join(OUTPUT_DIR, "index.html")
+    with report_stage("write_html", file=output_path) as rec:
+        tmp = f"{output_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            write_html(f, page_data)
+        keep = page_shard_refs(output_path) | page_shard_refs(tmp) if split_output else set()
+        os.replace(tmp, output_path)
+        rec["bytes"] = os.path.getsize(output_path)
+    
+    shard_dir = os.path.join(OUTPUT_DIR, SHARD_DIR)
+    if split_output:
+        sweep_shards(shard_dir, keep)
+    # 内联页面不引用分片：上次 --split-output 留下的分片目录一并删除，免得随页面部署出去
+    elif os.path.isdir(shard_dir):
+        shutil.rmtree(shard_dir)
+        print(f"   Removed stale {SHARD_DIR}/ from a previous --split-output build")
+    return output_path, rec["bytes"]
+
+def snapshot_data_files():
+    """data/ 下各 Tier 工作簿与 DAS PDF 的 (mtime, 大小)；文件不存在记为 None"""
+    snap = {}
+    for name in list(TIER_FILES.values()) + DAS_PDF_FILES:
         try:
-            xl = pd.ExcelFile(path)
-            fuel_rate = extract_fuel_rate(xl)
+            st = os.stat(os.path.join(DATA_DIR, name))
+            snap[name] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            snap[name] = None
+    return snap
+
+def watch_data(final_data, cache_mode="use", split_output=False):
+    """--watch：轮询 data/，文件停止变化 WATCH_DEBOUNCE 秒后只重新提取变动的 Tier / DAS，
+    就地更新 final_data 并重写页面；Ctrl+C 退出
+    """
+    print(f"\n👀 Watching {DATA_DIR}/ for changes (Ctrl+C to stop)...")
+    snap = snapshot_data_files()
+    try:
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            current = snapshot_data_files()
+            if current == snap:
+                continue
             
-            if fuel_rate > 0:
-                print(f"  [OK] Fuel rate detected: {fuel_rate*100:.2f}%")
+            # 去抖：拷贝 / 保存过程中文件会连续变化，等它稳定下来
+            while True:
+                time.sleep(WATCH_DEBOUNCE)
+                settled = snapshot_data_files()
+                if settled == current:
+                    break
+                current = settled
+            changed = [name for name in current if current[name] != snap.get(name)]
+            snap = current
             
-            for ch_key, conf in CHANNEL_CONFIG.items():
-                sheet = find_sheet_name(xl, conf["keywords"], conf.get("exclude"))
-                
-                if not sheet:
-                    print(f"  [Skip] {ch_key}: Sheet not found")
-                    continue
-                
-                try:
-                    df = pd.read_excel(xl, sheet_name=sheet, header=None)
-                    
-                    # **修正点3: 商住分表处理**
-                    if conf.get("has_res_com_split"):
-                        # 生成两套价格表
-                        prices_res = extract_prices(
-                            df, 
-                            split_side=None,
-                            channel_name=ch_key, 
-                            is_residential=True
-                        )
-                        prices_com = extract_prices(
-                            df, 
-                            split_side=None,
-                            channel_name=ch_key, 
-                            is_residential=False
-                        )
-                        
-                        if prices_res and prices_com:
-                            tier_data[ch_key] = {
-                                "prices_residential": prices_res,
-                                "prices_commercial": prices_com,
-                                "fuel_rate": fuel_rate if conf.get("fuel_mode") in ["standard", "discount_85"] else 0
-                            }
-                            print(f"  [OK] {ch_key}: Res={len(prices_res)}, Com={len(prices_com)} rows")
-                        else:
-                            print(f"  [Warn] {ch_key}: Commercial/Residential split failed")
-                    else:
-                        # 标准单表
-                        prices = extract_prices(
-                            df, 
-                            split_side=conf.get("sheet_side"), 
-                            channel_name=ch_key
-                        )
-                        
-                        if prices:
-                            tier_data[ch_key] = {
-                                "prices": prices,
-                                "fuel_rate": fuel_rate if conf.get("fuel_mode") in ["standard", "discount_85"] else 0
-                            }
-                            print(f"  [OK] {ch_key}: {len(prices)} rows")
-                        else:
-                            print(f"  [Warn] {ch_key}: No valid prices extracted")
-                
-                except Exception as e:
-                    print(f"  [Err] {ch_key}: {e}")
-        
-        except Exception as e:
-            print(f"  [Err] Failed to process {filename}: {e}")
-        
-        final_data["tiers"][tier] = tier_data
+            started = time.perf_counter()
+            print(f"\n[Watch] Changed: {', '.join(changed)}")
+            # 单次重建失败（如 xlsx 只保存了一半）只记录，继续轮询；文件再次变化时重试
+            try:
+                for tier, filename in TIER_FILES.items():
+                    if filename not in changed:
+                        continue
+                    res = process_tier(tier, filename, tier == ZIP_DB_TIER, cache_mode)
+                    if res is None:
+                        final_data["tiers"].pop(tier, None)
+                        continue
+                    if res["zip_db"] is not None:
+                        final_data["gofo_zips"] = res["zip_db"]
+                    final_data["tiers"][tier] = res["tier_data"]
+                # 保持 TIER_FILES 顺序，输出与完整构建一致
+                final_data["tiers"] = {t: final_data["tiers"][t] for t in TIER_FILES if t in final_data["tiers"]}
+                if any(pdf in changed for pdf in DAS_PDF_FILES):
+                    # 未变的 PDF 命中按内容哈希的缓存，只有变动的 PDF 会重新提取
+                    final_data["fedex_das"] = load_fedex_pdf_zips(cache_mode)
+            
+                output_path, size = write_page(final_data, split_output)
+                print(f"[OK] {output_path} updated ({size/1024:.1f} KB) in {time.perf_counter() - started:.2f}s")
+            except Exception as e:
+                print(f"[Err] Rebuild failed: {type(e).__name__}: {e}; waiting for the next change")
+            finally:
+                take_report_records()
+    except KeyboardInterrupt:
+        print("\n[OK] Watch stopped")
+
+def main(argv=None):
+    """主生成流程"""
+    parser = argparse.ArgumentParser(description="生成业务员报价助手页面")
+    parser.add_argument("-j", "--jobs", type=int, default=min(os.cpu_count() or 1, len(TIER_FILES) + 1),
+                        help="并发进程数（1 = 串行）")
+    parser.add_argument("--no-cache", action="store_true", help="不读写构建缓存")
+    parser.add_argument("--rebuild", action="store_true", help="忽略已有缓存，全部重新提取并刷新缓存")
+    parser.add_argument("--split-output", action="store_true",
+                        help="分片输出：各 Tier、邮编库、DAS 写成独立的带哈希 JSON，页面按需加载")
+    parser.add_argument("--report", default=REPORT_FILE, help="JSON 构建报告路径（空字符串 = 不写）")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"另存 cProfile 结果（{PROFILE_FILE}）并记录各阶段 tracemalloc 峰值；强制串行")
+    parser.add_argument("--watch", action="store_true",
+                        help=f"构建完成后监视 {DATA_DIR}/，只重新提取变动的 Tier / DAS PDF 并重写页面")
+    args = parser.parse_args(argv)
+    cache_mode = "off" if args.no_cache else ("rebuild" if args.rebuild else "use")
+    jobs = args.jobs
+    
+    if not os.path.exists(OUTPUT_DIR):
+        os.makedirs(OUTPUT_DIR)
+    
+    print("=" * 60)
+    print("🚀 Starting Generation (V2026.2.1 Data Fix)")
+    print("=" * 60)
+    
+    # cProfile 只能看到本进程，--profile 时串行执行以覆盖全部阶段
+    profiler = None
+    if args.profile:
+        if jobs > 1:
+            print(f"[Warn] --profile runs serially (jobs {jobs} -> 1)")
+            jobs = 1
+        tracemalloc.start()
+        profiler = cProfile.Profile()
+        profiler.enable()
+    started = time.perf_counter()
+    take_report_records()
+    
+    final_data = build_final_data(cache_mode, jobs)
+    zip_db = final_data["gofo_zips"]
 
     print("\n" + "=" * 60)
     print("📝 Generating HTML...")
     
-    json_str = json.dumps(final_data, ensure_ascii=False, indent=None).replace("NaN", "0")
-    html = HTML_TEMPLATE.replace('__JSON_DATA__', json_str)
-    
-    output_path = os.path.join(OUTPUT_DIR, "index.html")
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(html)
+    output_path, size = write_page(final_data, args.split_output)
     
     print(f"✅ HTML generated: {output_path}")
-    print(f"   File size: {len(html)/1024:.1f} KB")
+    print(f"   File size: {size/1024:.1f} KB")
+    
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(PROFILE_FILE)
+        tracemalloc.stop()
+        print(f"   Profile: {PROFILE_FILE}")
+    if args.report:
+        write_build_report(args.report, take_report_records(), {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "total_seconds": round(time.perf_counter() - started, 6),
+            "jobs": jobs,
+            "cache_mode": cache_mode,
+            "split_output": args.split_output,
+            "profile": args.profile,
+        })
+        print(f"   Build report: {args.report}")
     
     total_channels = sum(len(t) for t in final_data["tiers"].values())
     print(f"\n📊 Summary:")
     print(f"   Tiers: {len(final_data['tiers'])}")
     print(f"   Total channels: {total_channels}")
     print(f"   GOFO zips: {len(zip_db)}")
-    print(f"   FedEx remote zips: {len(fedex_remote)}")
+    print("   FedEx DAS zips: " + ", ".join(f"{c}={len(z)}" for c, z in final_data["fedex_das"].items()))
     
     print("\n" + "=" * 60)
     print("🎉 Generation Complete!")
     print("=" * 60)
+    
+    if args.watch:
+        watch_data(final_data, cache_mode, args.split_output)
 
 if __name__ == "__main__":
     main()
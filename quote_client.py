@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+报价服务本地测试客户端（仅标准库）
+
+在一条 keep-alive 连接上连续发送单票请求并统计吞吐，再发一次批量请求；
+声明 Accept-Encoding: gzip 并校验解压后的响应。
+
+用法:
+    python quote_server.py &
+    python quote_client.py -n 2000 --batch 5000
+"""
+import argparse
+import gzip
+import http.client
+import json
+import random
+import time
+
+WAREHOUSES = ["60632", "91730", "91752", "08691", "06801", "11791", "07032", "63461"]
+ZIPS = ["90001", "10001", "60601", "99540", "96704", "39362", "33101", "75201", "98101", "80202"]
+
+
+def random_shipment(rng):
+    return {
+        "warehouse": rng.choice(WAREHOUSES),
+        "zip": rng.choice(ZIPS),
+        "L": round(rng.uniform(1, 40), 1),
+        "W": round(rng.uniform(1, 25), 1),
+        "H": round(rng.uniform(1, 20), 1),
+        "weight": round(rng.uniform(0.1, 60), 1),
+        "addr_type": rng.choice(["res", "com"]),
+        "signature": rng.random() < 0.3,
+    }
+
+
+def post(conn, path, obj):
+    """发送 JSON 请求，返回 (状态码, 解析后的 JSON, 是否 gzip)"""
+    body = json.dumps(obj).encode("utf-8")
+    conn.request("POST", path, body, {
+        "Content-Type": "application/json",
+        "Accept-Encoding": "gzip",
+    })
+    resp = conn.getresponse()
+    data = resp.read()
+    gzipped = resp.getheader("Content-Encoding") == "gzip"
+    if gzipped:
+        data = gzip.decompress(data)
+    return resp.status, json.loads(data), gzipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="报价服务测试客户端")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("-n", type=int, default=2000, help="单票请求数")
+    parser.add_argument("--batch", type=int, default=5000, help="批量请求的票数（0 = 跳过）")
+    parser.add_argument("--tier", default="T3")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    conn = http.client.HTTPConnection(args.host, args.port, timeout=60)
+
+    shipments = [dict(random_shipment(rng), tier=args.tier) for _ in range(args.n)]
+    quoted = errors = 0
+    t0 = time.perf_counter()
+    for shipment in shipments:
+        status, obj, _ = post(conn, "/quote", shipment)
+        if status == 200:
+            quoted += bool(obj["quotes"])
+        else:
+            errors += 1
+    elapsed = time.perf_counter() - t0
+    print(f"[OK] /quote: {args.n} requests in {elapsed:.2f}s "
+          f"({args.n / elapsed:.0f} req/s), {quoted} with quotes, {errors} errors")
+
+    if args.batch:
+        batch = [random_shipment(rng) for _ in range(args.batch)]
+        t0 = time.perf_counter()
+        status, obj, gzipped = post(conn, "/quote/batch", {"shipments": batch, "tier": args.tier})
+        elapsed = time.perf_counter() - t0
+        if status != 200:
+            print(f"[Err] /quote/batch: HTTP {status} {obj}")
+            return 1
+        print(f"[OK] /quote/batch: {args.batch} shipments in {elapsed:.2f}s "
+              f"({args.batch / elapsed:.0f} quotes/s, gzip={gzipped})")
+
+    conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,633 @@
+#!/usr/bin/env python3
+"""
+报价引擎 - 与页面「计算报价」按钮完全一致的计费逻辑（Python 版）
+
+数据来自 generate_fixed.py 提取的 final_data；价格表在加载时按 Tier/渠道
+预先整理成有序重量档位数组，查价使用 bisect。
+
+批量模式对整张货件表做数组运算（NumPy），每个渠道一次性算完所有行。
+
+用法:
+    from quote_engine import quote
+    rows = quote("91730", "T3", "90001", (12, 10, 8), 5.5,
+                 residential=True, signature=False, fuel_rate=16.0)
+
+    # 批量重算历史货件（CSV / Parquet）
+    python quote_engine.py shipments.csv -o quotes.csv --tier T3 --fuel 16
+"""
+import argparse
+import bisect
+import contextlib
+import io
+import math
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import generate_fixed as gen
+
+# 体积重除数（与页面一致）
+DIM_DIVISOR = 222
+
+# 重量档位匹配容差（页面使用 r.w >= finalWt - 0.001）
+WEIGHT_EPS = 0.001
+
+# Zone 均为个位数（encode_zone_tables 有断言），批量价格矩阵按 10 列展开
+ZONE_WIDTH = 10
+
+# 批量输入列：必填 + 可选（addr_type 为 res/com，默认住宅；tier 缺省用命令行参数）
+BATCH_REQUIRED = ["warehouse", "zip", "L", "W", "H", "weight"]
+BATCH_OPTIONAL = ["addr_type", "signature", "tier"]
+COMMERCIAL_VALUES = ["com", "commercial", "商业"]
+TRUE_VALUES = ["1", "1.0", "true", "yes", "y", "是"]
+
+# XLmiles 服务判定：(代码, 名称, 最长边, 周长, 重量) 依次匹配
+XL_SERVICES = [
+    ("AH", "AH大件", 96, 130, 150),
+    ("OS", "OS大件", 108, 165, 150),
+    ("OM", "OM超限", 144, 225, 200),
+]
+
+
+# ==========================================
+# 1. 规格校验 / 服务判定
+# ==========================================
+
+def check_compliance(L, W, H, Wt):
+    """规格校验，返回各渠道族是否可用 {uniuni, usps, fedex_std, xl}"""
+    dims = sorted([L, W, H], reverse=True)
+    length = dims[0]
+    girth = dims[0] + 2 * (dims[1] + dims[2])
+    return {
+        "uniuni": not (Wt > 20 or length > 20),
+        "usps": not (Wt > 70 or girth > 130),
+        "fedex_std": not (Wt > 150 or length > 108),
+        "xl": not (Wt > 200 or length > 144 or girth > 225),
+    }
+
+
+def get_xl_service(L, W, H, Wt):
+    """XLmiles 服务判定，返回 (代码, 名称)；超规格时代码为 None"""
+    dims = sorted([L, W, H], reverse=True)
+    girth = dims[0] + 2 * (dims[1] + dims[2])
+    for code, name, max_len, max_girth, max_wt in XL_SERVICES:
+        if dims[0] <= max_len and girth <= max_girth and Wt <= max_wt:
+            return code, name
+    return None, "超XL规格"
+
+
+def check_compliance_array(L, W, H, Wt):
+    """check_compliance 的数组版，各项为布尔数组"""
+    dims = np.sort(np.stack([L, W, H], axis=1), axis=1)[:, ::-1]
+    length = dims[:, 0]
+    girth = dims[:, 0] + 2 * (dims[:, 1] + dims[:, 2])
+    return {
+        "uniuni": ~((Wt > 20) | (length > 20)),
+        "usps": ~((Wt > 70) | (girth > 130)),
+        "fedex_std": ~((Wt > 150) | (length > 108)),
+        "xl": ~((Wt > 200) | (length > 144) | (girth > 225)),
+        "dims": dims,
+        "girth": girth,
+    }
+
+
+def get_xl_service_array(dims, girth, Wt):
+    """get_xl_service 的数组版，返回 XL_SERVICES 下标数组（超规格为 -1）"""
+    conds = [(dims[:, 0] <= max_len) & (girth <= max_girth) & (Wt <= max_wt)
+             for _, _, max_len, max_girth, max_wt in XL_SERVICES]
+    return np.select(conds, list(range(len(XL_SERVICES))), default=-1)
+
+
+def channel_checks(ch_name):
+    """渠道名称对应需要通过的规格校验项（与页面规则相同）"""
+    checks = []
+    if "UNIUNI" in ch_name:
+        checks.append("uniuni")
+    if "USPS" in ch_name:
+        checks.append("usps")
+    if "XLmiles" in ch_name:
+        checks.append("xl")
+    if "FedEx" in ch_name and "超大" not in ch_name:
+        checks.append("fedex_std")
+    return checks
+
+
+def channel_allowed(ch_name, comp):
+    """按渠道名称对应的规格校验结果过滤"""
+    return all(comp[key] for key in channel_checks(ch_name))
+
+
+def billable_weight(L, W, H, Wt, precision):
+    """计费重：max(实重, 体积重) 按渠道精度向上取整"""
+    raw = max(Wt, (L * W * H) / DIM_DIVISOR)
+    return math.ceil(raw / precision) * precision
+
+
+# ==========================================
+# 2. 价格表索引
+# ==========================================
+
+class RateTable:
+    """单张价格表：按重量排序的档位数组 + 每档的 {zone: price}
+
+    XLmiles 表按服务拆成多个子表，各自有序。
+    """
+
+    def __init__(self, rows):
+        rows = sorted(rows, key=lambda r: r["w"])
+        self.weights = [r["w"] for r in rows]
+        self.prices = [{k: v for k, v in r.items() if isinstance(k, int)} for r in rows]
+        self._dense = None
+
+    def find(self, weight, zone=None):
+        """第一个重量 >= weight 的档位（指定 zone 时跳过该 Zone 无价的档位）"""
+        i = bisect.bisect_left(self.weights, weight - WEIGHT_EPS)
+        if zone is None:
+            return self.prices[i] if i < len(self.prices) else None
+        for prices in self.prices[i:]:
+            if zone in prices:
+                return prices
+        return None
+
+    def dense(self):
+        """批量用稠密形式：(重量数组, 价格矩阵[档位, Zone], 各 Zone 自该档起第一个有价档位)
+
+        矩阵末尾多一行全 0 哨兵，searchsorted 超出最大重量时落在哨兵上。
+        """
+        if self._dense is None:
+            n = len(self.weights)
+            matrix = np.zeros((n + 1, ZONE_WIDTH))
+            for i, prices in enumerate(self.prices):
+                for z, p in prices.items():
+                    if 0 <= z < ZONE_WIDTH:
+                        matrix[i, z] = p
+            nxt = np.full((n + 1, ZONE_WIDTH), n)
+            for i in range(n - 1, -1, -1):
+                nxt[i] = np.where(matrix[i] > 0, i, nxt[i + 1])
+            self._dense = (np.asarray(self.weights, dtype=float), matrix, nxt)
+        return self._dense
+
+
+def index_channel(entry):
+    """把 final_data 中一个渠道的价格数据整理成 {表名: RateTable 或 {服务: RateTable}}"""
+    tables = {}
+    for key in ("prices", "prices_residential", "prices_commercial"):
+        rows = entry.get(key)
+        if not rows:
+            continue
+        if any("service" in r for r in rows):
+            by_svc = {}
+            for r in rows:
+                by_svc.setdefault(r.get("service"), []).append(r)
+            tables[key] = {svc: RateTable(svc_rows) for svc, svc_rows in by_svc.items()}
+        else:
+            tables[key] = RateTable(rows)
+    return tables
+
+
+def lookup_price(table, weights, zones, fallback_zone):
+    """批量查价：每个重量取第一个 >= 重量的档位，Zone 无价时退回 fallback_zone 列"""
+    breaks, matrix, _ = table.dense()
+    i = np.searchsorted(breaks, weights - WEIGHT_EPS, side="left")
+    price = matrix[i, zones]
+    return np.where(price > 0, price, matrix[i, fallback_zone])
+
+
+def lookup_first_priced(table, weights, zones, fallback_zone):
+    """批量查价（XLmiles 规则）：从重量档位起取第一个该 Zone 有价的档位"""
+    breaks, matrix, nxt = table.dense()
+    i = np.searchsorted(breaks, weights - WEIGHT_EPS, side="left")
+    j = nxt[i, zones]
+    price = matrix[j, zones]
+    return np.where(price > 0, price, matrix[j, fallback_zone])
+
+
+# ==========================================
+# 3. 报价引擎
+# ==========================================
+
+class QuoteEngine:
+    """基于 final_data 的报价引擎；构造时完成全部索引，quote() 只做查表与运算"""
+
+    def __init__(self, final_data):
+        self.warehouses = final_data["warehouses"]
+        self.channels = final_data["channels"]
+        self.zip_db = final_data.get("gofo_zips", {})
+        self.zone_tables = gen.compile_zone_tables()
+        self.tiers = {
+            tier: {ch: index_channel(entry) for ch, entry in tier_data.items()}
+            for tier, tier_data in final_data["tiers"].items()
+        }
+        self.default_fuel_rate = self._default_fuel_rate(final_data)
+        self._zip_regions = None
+
+    @staticmethod
+    def _default_fuel_rate(final_data):
+        """与页面初始化一致：取 T3 各渠道燃油费率最大值（百分比），没有则 16.0"""
+        rates = [ch.get("fuel_rate") or 0 for ch in final_data["tiers"].get("T3", {}).values()]
+        best = max(rates, default=0)
+        return round(best * 100, 2) if best > 0 else 16.0
+
+    def calc_zone(self, dest_zip, wh_code, zone_source):
+        """与页面 calcZone 相同：GOFO 走大区矩阵，其余按 3 位前缀查表"""
+        if not dest_zip or len(dest_zip) < 3:
+            return self.zone_tables["fallback"]
+        region = self.warehouses[wh_code]["region"]
+        if zone_source == "gofo":
+            rec = self.zip_db.get(dest_zip)
+            pairs = self.zone_tables["gofo"].get(region, {})
+            return (rec and pairs.get(rec["region"])) or self.zone_tables["gofo_default"]
+        source = "xlmiles" if zone_source == "xlmiles" else "general"
+        table = self.zone_tables[source].get(region)
+        return table[int(dest_zip[:3])] if table else self.zone_tables["fallback"]
+
+    def quote(self, warehouse, tier, zip, dims, weight, residential=True, signature=False, fuel_rate=None):
+        """对一个包裹计算全部可用渠道的报价
+
+        dims 为 (L, W, H) 英寸，weight 为实重磅数，fuel_rate 为燃油费率百分比（默认同页面）。
+        返回按渠道配置顺序排列的结果列表；输入不合法时抛出 ValueError。
+        """
+        L, W, H = (float(d or 0) for d in dims)
+        Wt = float(weight or 0)
+        zip = str(zip or "").strip()
+        fuel_pct = self.default_fuel_rate if fuel_rate is None else float(fuel_rate)
+
+        errors = []
+        if warehouse not in self.warehouses:
+            errors.append("请选择发货仓库")
+        if len(zip) != 5 or not (zip.isascii() and zip.isdigit()):
+            errors.append("请输入5位邮编")
+        # inf / NaN 会让计费重取整溢出，或让下面的大小比较全部为假
+        if not all(math.isfinite(v) for v in (L, W, H, Wt, fuel_pct)):
+            errors.append("尺寸 / 重量 / 燃油费率必须是有限数值")
+        else:
+            if Wt <= 0:
+                errors.append("实重必须大于0")
+            if L <= 0 or W <= 0 or H <= 0:
+                errors.append("包裹尺寸必须大于0")
+        if tier not in self.tiers:
+            errors.append("未知 Tier")
+        if errors:
+            raise ValueError("; ".join(errors))
+
+        comp = check_compliance(L, W, H, Wt)
+        tier_tables = self.tiers[tier]
+        results = []
+
+        for ch_name, conf in self.channels.items():
+            if warehouse not in conf["allow_wh"] or not channel_allowed(ch_name, comp):
+                continue
+
+            precision = conf.get("weight_precision") or 1
+            final_wt = billable_weight(L, W, H, Wt, precision)
+            zone = self.calc_zone(zip, warehouse, conf.get("zone_source"))
+            tables = tier_tables.get(ch_name, {})
+
+            price_table = None
+            table = tables.get("prices")
+            if "prices_residential" in tables and "prices_commercial" in tables:
+                price_table = "residential" if residential else "commercial"
+                table = tables[f"prices_{price_table}"]
+            if not table:
+                continue
+
+            service = None
+            base = 0
+            if "XLmiles" in ch_name:
+                code, service = get_xl_service(L, W, H, Wt)
+                if not code:
+                    continue
+                svc_table = table.get(code) if isinstance(table, dict) else None
+                row = svc_table.find(final_wt, zone) if svc_table else None
+                if row:
+                    base = row.get(zone) or row.get(6) or 0
+            else:
+                row = table.find(final_wt)
+                if row:
+                    base = row.get(zone) or row.get(8) or 0
+
+            if base <= 0:
+                continue
+
+            fees = conf["fees"]
+            surcharges = {}
+            if residential and fees["res"] > 0:
+                surcharges["res"] = fees["res"]
+            if signature and fees["sig"] > 0:
+                surcharges["sig"] = fees["sig"]
+
+            subtotal = base + sum(surcharges.values())
+            fuel_mode = conf.get("fuel_mode")
+            rate = 0.0
+            if fuel_mode not in ("none", "included"):
+                rate = fuel_pct / 100
+                if fuel_mode == "discount_85":
+                    rate = rate * 0.85
+                surcharges["fuel"] = subtotal * rate
+
+            results.append({
+                "channel": ch_name,
+                "service": service,
+                "price_table": price_table,
+                "zone": zone,
+                "billable_weight": final_wt,
+                "base": base,
+                "fuel_mode": fuel_mode,
+                "fuel_rate": rate,
+                "surcharges": surcharges,
+                "total": base + sum(surcharges.values()),
+            })
+
+        return results
+
+    # ------------------------------------------
+    # 批量报价（数组运算）
+    # ------------------------------------------
+
+    def _gofo_zip_regions(self):
+        """GOFO 邮编 → 大区编码的 10 万项数组（-1 为库中没有），返回 (大区名列表, 数组)"""
+        if self._zip_regions is None:
+            names = sorted({rec["region"] for rec in self.zip_db.values()})
+            code_of = {name: i for i, name in enumerate(names)}
+            codes = np.full(100000, -1, dtype=np.int32)
+            for z, rec in self.zip_db.items():
+                if len(z) == 5 and z.isdigit():
+                    codes[int(z)] = code_of[rec["region"]]
+            self._zip_regions = (names, codes)
+        return self._zip_regions
+
+    def zone_array(self, zips, wh_regions, region_names, zone_source):
+        """calc_zone 的数组版：zips 为整数邮编，wh_regions 为仓库大区在 region_names 中的下标"""
+        if zone_source == "gofo":
+            zip_names, zip_codes = self._gofo_zip_regions()
+            default = self.zone_tables["gofo_default"]
+            # 末列对应库中没有的邮编（编码 -1）
+            pair = np.full((len(region_names), len(zip_names) + 1), default)
+            for i, region in enumerate(region_names):
+                pairs = self.zone_tables["gofo"].get(region, {})
+                for j, zip_region in enumerate(zip_names):
+                    pair[i, j] = pairs.get(zip_region) or default
+            return pair[wh_regions, zip_codes[zips]]
+        source = "xlmiles" if zone_source == "xlmiles" else "general"
+        prefix = np.full((len(region_names), 1000), self.zone_tables["fallback"])
+        for i, region in enumerate(region_names):
+            table = self.zone_tables[source].get(region)
+            if table:
+                prefix[i] = table
+        return prefix[wh_regions, zips // 100]
+
+    def quote_batch(self, shipments, tier="T3", fuel_rate=None):
+        """批量报价：shipments 为含 BATCH_REQUIRED 列的 DataFrame（可选 BATCH_OPTIONAL 列）
+
+        每个渠道对所有行一次性计算：searchsorted 定位重量档位，Zone 查表，
+        附加费与燃油按数组运算。返回与 shipments 同索引的 DataFrame：每个渠道一列
+        含燃油总价（不可用为 NaN，不做舍入），外加 best_channel / best_total / error。
+        计费规则与 quote() 逐行一致。
+        """
+        missing = [c for c in BATCH_REQUIRED if c not in shipments.columns]
+        if missing:
+            raise ValueError(f"缺少列: {', '.join(missing)}")
+
+        n = len(shipments)
+        fuel_pct = self.default_fuel_rate if fuel_rate is None else float(fuel_rate)
+        if not math.isfinite(fuel_pct):
+            raise ValueError("燃油费率必须是有限数值")
+        L, W, H, Wt = (pd.to_numeric(shipments[c], errors="coerce").fillna(0).to_numpy(dtype=float)
+                       for c in ("L", "W", "H", "weight"))
+
+        # 代码列重复度高：字符串处理只对去重值做一次，再按位置展开成整数编码
+        wh_codes = list(self.warehouses)
+        tier_names = list(self.tiers)
+        region_names = sorted({w["region"] for w in self.warehouses.values()})
+        wh_idx = map_unique(shipments["warehouse"], lambda u: lookup_codes(normalize_codes(u, width=5), wh_codes))
+        zips = map_unique(shipments["zip"], parse_zips)
+        tier_idx = (map_unique(shipments["tier"], lambda u: lookup_codes(normalize_codes(u), tier_names))
+                    if "tier" in shipments.columns
+                    else np.full(n, tier_names.index(tier) if tier in tier_names else -1))
+        res = (map_unique(shipments["addr_type"],
+                          lambda u: ~normalize_codes(u).str.lower().isin(COMMERCIAL_VALUES))
+               if "addr_type" in shipments.columns else np.ones(n, dtype=bool))
+        sig = (map_unique(shipments["signature"], lambda u: normalize_codes(u).str.lower().isin(TRUE_VALUES))
+               if "signature" in shipments.columns else np.zeros(n, dtype=bool))
+        wh_regions = np.array([region_names.index(self.warehouses[c]["region"]) for c in wh_codes])[wh_idx]
+
+        # 输入校验（与 quote() 的 ValueError 信息相同），错误文本只为出错行拼接
+        finite = np.isfinite(L) & np.isfinite(W) & np.isfinite(H) & np.isfinite(Wt)
+        checks = [(wh_idx < 0, "请选择发货仓库"),
+                  (zips < 0, "请输入5位邮编"),
+                  (~finite, "尺寸 / 重量 / 燃油费率必须是有限数值"),
+                  (finite & (Wt <= 0), "实重必须大于0"),
+                  (finite & ((L <= 0) | (W <= 0) | (H <= 0)), "包裹尺寸必须大于0"),
+                  (tier_idx < 0, "未知 Tier")]
+        valid = ~np.logical_or.reduce([mask for mask, _ in checks])
+        error = np.full(n, "", dtype=object)
+        bad_rows = np.flatnonzero(~valid)
+        error[bad_rows] = ["; ".join(msg for mask, msg in checks if mask[i]) for i in bad_rows]
+
+        comp = check_compliance_array(L, W, H, Wt)
+        xl_service = get_xl_service_array(comp["dims"], comp["girth"], Wt)
+        raw_wt = np.maximum(Wt, (L * W * H) / DIM_DIVISOR)
+
+        channels = list(self.channels)
+        totals = np.full((n, len(channels)), np.nan)
+        zone_cache = {}
+        for c, ch_name in enumerate(channels):
+            conf = self.channels[ch_name]
+            allow = np.array([code in conf["allow_wh"] for code in wh_codes])
+            ok = valid & allow[wh_idx]
+            for key in channel_checks(ch_name):
+                ok &= comp[key]
+            if "XLmiles" in ch_name:
+                ok &= xl_service >= 0
+            if not ok.any():
+                continue
+
+            precision = conf.get("weight_precision") or 1
+            final_wt = np.ceil(raw_wt / precision) * precision
+            source = conf.get("zone_source")
+            if source not in zone_cache:
+                zone_cache[source] = self.zone_array(zips, wh_regions, region_names, source)
+            zones = zone_cache[source]
+
+            base = np.zeros(n)
+            for t, tier_tables in enumerate(self.tiers.values()):
+                tables = tier_tables.get(ch_name, {})
+                rows = ok & (tier_idx == t)
+                if not tables or not rows.any():
+                    continue
+                if "prices_residential" in tables and "prices_commercial" in tables:
+                    groups = [(tables["prices_residential"], rows & res),
+                              (tables["prices_commercial"], rows & ~res)]
+                else:
+                    groups = [(tables.get("prices"), rows)]
+                for table, sel in groups:
+                    if not table:
+                        continue
+                    if "XLmiles" in ch_name:
+                        if not isinstance(table, dict):
+                            continue
+                        for k, (code, *_) in enumerate(XL_SERVICES):
+                            svc_table = table.get(code)
+                            idx = np.flatnonzero(sel & (xl_service == k))
+                            if svc_table is None or not idx.size:
+                                continue
+                            base[idx] = lookup_first_priced(svc_table, final_wt[idx], zones[idx], 6)
+                    else:
+                        idx = np.flatnonzero(sel)
+                        base[idx] = lookup_price(table, final_wt[idx], zones[idx], 8)
+
+            fees = conf["fees"]
+            extra = np.zeros(n)
+            if fees["res"] > 0:
+                extra = extra + np.where(res, fees["res"], 0.0)
+            if fees["sig"] > 0:
+                extra = extra + np.where(sig, fees["sig"], 0.0)
+            total = base + extra
+            fuel_mode = conf.get("fuel_mode")
+            if fuel_mode not in ("none", "included"):
+                rate = fuel_pct / 100
+                if fuel_mode == "discount_85":
+                    rate = rate * 0.85
+                total = base + (extra + (base + extra) * rate)
+            totals[:, c] = np.where(base > 0, total, np.nan)
+
+        result = pd.DataFrame(totals, index=shipments.index, columns=channels)
+        filled = np.where(np.isnan(totals), np.inf, totals)
+        best = filled.argmin(axis=1)
+        has_quote = np.isfinite(filled).any(axis=1)
+        result["best_channel"] = np.where(has_quote, np.array(channels, dtype=object)[best], None)
+        result["best_total"] = np.where(has_quote, filled[np.arange(n), best], np.nan)
+        result["error"] = error
+        return result
+
+
+# ==========================================
+# 4. 默认引擎
+# ==========================================
+
+_ENGINE = None
+
+
+def load_final_data(cache_mode="use"):
+    """运行（或从构建缓存加载）数据提取，返回 final_data；需在仓库根目录下运行"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return gen.build_final_data(cache_mode)
+
+
+def get_engine():
+    """惰性创建默认引擎（进程内只提取一次数据）"""
+    global _ENGINE
+    if _ENGINE is None:
+        _ENGINE = QuoteEngine(load_final_data())
+    return _ENGINE
+
+
+def quote(warehouse, tier, zip, dims, weight, residential=True, signature=False, fuel_rate=None):
+    """使用默认引擎报价，参数见 QuoteEngine.quote"""
+    return get_engine().quote(warehouse, tier, zip, dims, weight, residential, signature, fuel_rate)
+
+
+# ==========================================
+# 5. 批量报价文件读写 / 命令行
+# ==========================================
+
+def normalize_codes(col, width=None):
+    """仓库号 / 邮编等代码列统一成字符串（数字列会丢前导 0 与带 .0，这里补回；
+    字符串列中不足 width 位的纯数字同样补 0，与页面 padStart 一致）"""
+    if pd.api.types.is_numeric_dtype(col):
+        col = pd.to_numeric(col, errors="coerce").astype("Int64").astype(str).replace("<NA>", "")
+        return col.str.zfill(width) if width else col
+    col = col.astype(str).str.strip()
+    if width:
+        digits = col.str.fullmatch(r"[0-9]+").fillna(False).astype(bool)
+        col = col.where(~digits, col.str.zfill(width))
+    return col
+
+
+def map_unique(col, func):
+    """对列的去重值调用 func（返回等长序列），再按位置展开回整列的 numpy 数组"""
+    codes, uniques = pd.factorize(col, use_na_sentinel=False)
+    return np.asarray(func(pd.Series(uniques, dtype=col.dtype)))[codes]
+
+
+def lookup_codes(values, names):
+    """字符串列 → 在 names 中的下标，找不到为 -1"""
+    return values.map({name: i for i, name in enumerate(names)}).fillna(-1).astype(int)
+
+
+def parse_zips(col):
+    """邮编列 → 整数邮编，不是 5 位数字的为 -1"""
+    col = normalize_codes(col, width=5)
+    ok = col.str.fullmatch(r"\d{5}").fillna(False).astype(bool)
+    return pd.to_numeric(col.where(ok), errors="coerce").fillna(-1).astype(int)
+
+
+def is_parquet(path):
+    return os.path.splitext(path)[1].lower() in (".parquet", ".pq")
+
+
+def read_shipments(path):
+    """读取货件文件（CSV 或 Parquet），代码列按字符串读入以保留前导 0"""
+    if is_parquet(path):
+        return pd.read_parquet(path)
+    return pd.read_csv(path, dtype={"warehouse": str, "zip": str, "tier": str})
+
+
+def write_results(df, path, money_cols=()):
+    """写出结果文件，格式由扩展名决定；CSV 中 money_cols 保留两位（与页面 toFixed(2) 相同），
+    输入列原样写出，带 BOM 方便 Excel 打开中文列名"""
+    if is_parquet(path):
+        df.to_parquet(path, index=False)
+    else:
+        df = df.assign(**{c: df[c].map(lambda v: "" if pd.isna(v) else f"{v:.2f}") for c in money_cols})
+        df.to_csv(path, index=False, encoding="utf-8-sig")
+
+
+def main(argv=None):
+    """批量报价：读取货件文件，计算全部可用渠道总价后写出结果文件"""
+    parser = argparse.ArgumentParser(description="批量报价（CSV / Parquet 货件文件）")
+    parser.add_argument("input", help="货件文件，列: " + ", ".join(BATCH_REQUIRED + BATCH_OPTIONAL))
+    parser.add_argument("-o", "--output", help="结果文件（默认 <输入名>_quotes.csv）")
+    parser.add_argument("--tier", default="T3", help="文件中没有 tier 列时使用的 Tier")
+    parser.add_argument("--fuel", type=float, default=None, help="燃油费率 %%（默认同页面）")
+    parser.add_argument("--no-cache", action="store_true", help="不读写构建缓存")
+    args = parser.parse_args(argv)
+    output = args.output or os.path.splitext(args.input)[0] + "_quotes.csv"
+
+    t0 = time.perf_counter()
+    try:
+        shipments = read_shipments(args.input)
+    except ImportError as e:
+        print(f"[Err] 读取 Parquet 失败: {e}")
+        return 1
+    engine = QuoteEngine(load_final_data("off" if args.no_cache else "use"))
+    t1 = time.perf_counter()
+
+    try:
+        result = engine.quote_batch(shipments, args.tier, args.fuel)
+    except ValueError as e:
+        print(f"[Err] {e}")
+        return 1
+    t2 = time.perf_counter()
+
+    out = pd.concat([shipments, result], axis=1)
+    try:
+        write_results(out, output, [c for c in result.columns if c not in ("best_channel", "error")])
+    except ImportError as e:
+        print(f"[Err] 写出 Parquet 失败: {e}")
+        return 1
+    t3 = time.perf_counter()
+
+    quoted = int(result["best_channel"].notna().sum())
+    errors = int((result["error"] != "").sum())
+    print(f"[OK] {len(shipments)} rows -> {output}")
+    print(f"   有报价: {quoted}  输入错误: {errors}")
+    print(f"   读取+加载 {t1 - t0:.2f}s | 计算 {t2 - t1:.2f}s | 写出 {t3 - t2:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+报价服务 - 本地 asyncio HTTP 接口，供订单系统程序化取价
+
+启动时加载一次 generate_fixed.py 提取的价格数据（走构建缓存），之后全部在内存中计算。
+只依赖标准库 + quote_engine；支持 HTTP/1.1 keep-alive，客户端声明 gzip 时压缩响应。
+
+接口:
+    POST /quote        单票  {"warehouse": "91730", "zip": "90001", "L": 12, "W": 10, "H": 8,
+                              "weight": 5.5, "addr_type": "res", "signature": false,
+                              "tier": "T3", "fuel_rate": 16}
+                       返回  {"quotes": [...]}，输入不合法时 400 {"error": "..."}
+    POST /quote/batch  多票  {"shipments": [{...}, ...], "tier": "T3", "fuel_rate": 16}
+                       返回  {"results": [{"quotes": [...]} 或 {"error": "..."}, ...]}
+    GET  /health       数据概况
+
+用法:
+    python quote_server.py --port 8765
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import time
+
+import quote_engine as qe
+
+# 请求体上限（批量接口一次可传数万票）
+MAX_BODY = 32 * 1024 * 1024
+
+# 小于该长度的响应不压缩
+GZIP_MIN_SIZE = 1024
+
+# keep-alive 连接空闲超时（秒）
+IDLE_TIMEOUT = 30
+
+STATUS_TEXT = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+
+# ==========================================
+# 1. 报价请求 / 响应
+# ==========================================
+
+def money(x):
+    """金额保留两位（与页面 toFixed(2) 一致）"""
+    return round(x, 2)
+
+
+def format_quote(row):
+    """引擎结果 → 接口输出：金额保留两位，其余原样"""
+    out = dict(row)
+    out["base"] = money(row["base"])
+    out["total"] = money(row["total"])
+    out["surcharges"] = {k: money(v) for k, v in row["surcharges"].items()}
+    return out
+
+
+def quote_one(engine, shipment, defaults):
+    """单票报价；shipment 字段同批量 CSV 列，tier / fuel_rate 缺省取 defaults"""
+    if not isinstance(shipment, dict):
+        raise ValueError("shipment 必须是 JSON 对象")
+
+    def get(key):
+        return shipment.get(key, defaults.get(key))
+
+    addr = str(get("addr_type") or "res").strip().lower()
+    sig = str(get("signature") or "").strip().lower()
+    try:
+        dims = tuple(float(get(k) or 0) for k in ("L", "W", "H"))
+        weight = float(get("weight") or 0)
+        fuel_rate = get("fuel_rate")
+        fuel_rate = None if fuel_rate is None else float(fuel_rate)
+    except (TypeError, ValueError):
+        raise ValueError("尺寸 / 重量 / 燃油费率必须是数字")
+    rows = engine.quote(
+        str(get("warehouse") or ""), str(get("tier") or "T3"), str(get("zip") or ""),
+        dims, weight,
+        residential=addr not in qe.COMMERCIAL_VALUES,
+        signature=sig in qe.TRUE_VALUES,
+        fuel_rate=fuel_rate,
+    )
+    return [format_quote(r) for r in rows]
+
+
+def handle_quote(engine, payload):
+    try:
+        return 200, {"quotes": quote_one(engine, payload, {})}
+    except ValueError as e:
+        return 400, {"error": str(e)}
+
+
+def handle_batch(engine, payload):
+    shipments = payload.get("shipments") if isinstance(payload, dict) else None
+    if not isinstance(shipments, list):
+        return 400, {"error": "缺少 shipments 列表"}
+    defaults = {k: payload[k] for k in ("tier", "fuel_rate") if k in payload}
+    results = []
+    for shipment in shipments:
+        try:
+            results.append({"quotes": quote_one(engine, shipment, defaults)})
+        except ValueError as e:
+            results.append({"error": str(e)})
+    return 200, {"results": results}
+
+
+ROUTES = {
+    "/quote": handle_quote,
+    "/quote/batch": handle_batch,
+}
+
+
+# ==========================================
+# 2. HTTP 连接处理
+# ==========================================
+
+def build_response(status, obj, gzip_ok, keep_alive):
+    body = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    headers = [
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+        "Content-Type: application/json; charset=utf-8",
+        "Vary: Accept-Encoding",
+    ]
+    if gzip_ok and len(body) >= GZIP_MIN_SIZE:
+        body = gzip.compress(body, compresslevel=5)
+        headers.append("Content-Encoding: gzip")
+    headers.append(f"Content-Length: {len(body)}")
+    headers.append("Connection: " + ("keep-alive" if keep_alive else "close"))
+    return ("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body
+
+
+def parse_head(raw):
+    """解析请求行与头部，返回 (方法, 路径, 版本, {小写头名: 值})"""
+    lines = raw.decode("latin-1").split("\r\n")
+    method, path, version = lines[0].split(" ", 2)
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            k, v = line.split(":", 1)
+            headers[k.strip().lower()] = v.strip()
+    return method, path.split("?", 1)[0], version, headers
+
+
+async def handle_connection(engine, stats, reader, writer):
+    try:
+        while True:
+            try:
+                raw = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), IDLE_TIMEOUT)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError,
+                    ConnectionError):
+                break
+            try:
+                method, path, version, headers = parse_head(raw[:-4])
+            except ValueError:
+                writer.write(build_response(400, {"error": "请求行格式错误"}, False, False))
+                break
+
+            conn = headers.get("connection", "").lower()
+            keep_alive = conn != "close" if version == "HTTP/1.1" else conn == "keep-alive"
+            gzip_ok = "gzip" in headers.get("accept-encoding", "")
+
+            body = b""
+            if "chunked" in headers.get("transfer-encoding", "").lower():
+                status, obj, keep_alive = 411, {"error": "需要 Content-Length"}, False
+            else:
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    status, obj, keep_alive = 400, {"error": "Content-Length 不合法"}, False
+                elif length > MAX_BODY:
+                    status, obj, keep_alive = 413, {"error": "请求体过大"}, False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, obj = safe_dispatch(engine, stats, method, path, body)
+
+            writer.write(build_response(status, obj, gzip_ok, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+def safe_dispatch(engine, stats, method, path, body):
+    """dispatch 外层兜底：处理器里的意外异常返回 500 JSON，不让连接任务退出"""
+    try:
+        return dispatch(engine, stats, method, path, body)
+    except Exception as e:
+        print(f"[Err] {method} {path}: {type(e).__name__}: {e}")
+        return 500, {"error": "服务内部错误"}
+
+
+def dispatch(engine, stats, method, path, body):
+    if path == "/health" and method == "GET":
+        return 200, dict(stats, uptime=round(time.time() - stats["started"], 1))
+    handler = ROUTES.get(path)
+    if handler is None:
+        return 404, {"error": f"未知路径 {path}"}
+    if method != "POST":
+        return 405, {"error": "只支持 POST"}
+    try:
+        payload = json.loads(body or b"{}")
+    except ValueError:
+        return 400, {"error": "请求体不是合法 JSON"}
+    return handler(engine, payload)
+
+
+# ==========================================
+# 3. 启动
+# ==========================================
+
+async def serve(engine, host, port):
+    stats = {
+        "started": time.time(),
+        "tiers": list(engine.tiers),
+        "channels": list(engine.channels),
+        "gofo_zips": len(engine.zip_db),
+    }
+    server = await asyncio.start_server(
+        lambda r, w: handle_connection(engine, stats, r, w), host, port)
+    print(f"[OK] Quote service listening on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地报价 HTTP 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--no-cache", action="store_true", help="不读写构建缓存")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    engine = qe.QuoteEngine(qe.load_final_data("off" if args.no_cache else "use"))
+    print(f"[OK] Rate data loaded in {time.perf_counter() - t0:.2f}s "
+          f"({len(engine.tiers)} tiers, {len(engine.zip_db)} GOFO zips)")
+    try:
+        asyncio.run(serve(engine, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
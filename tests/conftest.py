@@ -0,0 +1,31 @@
+"""
+测试公共夹具：用 benchmark.py 的合成工作簿（1×）跑一次数据提取，不读写构建缓存
+"""
+import contextlib
+import io
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import benchmark  # noqa: E402
+import generate_fixed as gen  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def final_data(tmp_path_factory):
+    data_dir = benchmark.ensure_workbooks(str(tmp_path_factory.mktemp("workbooks")), 1)
+    saved_dir = gen.DATA_DIR
+    gen.DATA_DIR = data_dir
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            data = gen.build_final_data("off")
+        yield data
+    finally:
+        for filename in gen.TIER_FILES.values():
+            gen.release_workbook(filename)
+        gen.DATA_DIR = saved_dir
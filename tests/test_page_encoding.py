@@ -0,0 +1,112 @@
+"""
+页面数据编码可无损还原：价格表去重（dedup_price_tables）与 GOFO 邮编分块（encode_zip_table）
+
+解码函数按页面 JS（priceTable / gofoChunk）逐步实现，数据先经 JSON 往返，与页面拿到的一致。
+"""
+import json
+
+import numpy as np
+
+import generate_fixed as gen
+
+PRICE_KEYS = ("prices", "prices_residential", "prices_commercial")
+
+
+def json_roundtrip(obj):
+    return json.loads(gen.dump_json(obj))
+
+
+def decode_price_table(raw, price_base):
+    """页面 priceTable：基准矩阵 × k（按 kd 位取整）+ 稀疏差值（按 decimals 位取整）"""
+    m = np.array(price_base["bases"][raw["b"]], dtype=float)
+    if "k" in raw:
+        m = gen.js_round(m * raw["k"], raw["kd"])
+    for i, dv in zip(raw.get("di", []), raw.get("dv", [])):
+        m[i] = gen.js_round(m[i] + dv, price_base["decimals"])
+    skeleton = price_base["skeletons"][raw["s"]]
+    return {"w": skeleton["w"], "zones": skeleton["zones"], "m": m}
+
+
+def assert_price_tables_roundtrip(tiers):
+    encoded, price_base = json_roundtrip(gen.dedup_price_tables(tiers))
+    for tier, tier_data in tiers.items():
+        for ch, entry in tier_data.items():
+            for key in PRICE_KEYS:
+                if not entry.get(key):
+                    continue
+                got = decode_price_table(encoded[tier][ch][key], price_base)
+                assert got["w"] == entry[key]["w"], (tier, ch, key)
+                assert got["zones"] == entry[key]["zones"], (tier, ch, key)
+                assert np.array_equal(got["m"], np.asarray(entry[key]["m"], dtype=float)), (tier, ch, key)
+    return encoded, price_base
+
+
+def test_price_tables_roundtrip(final_data):
+    tiers = {tier: {ch: gen.index_price_tables(entry) for ch, entry in tier_data.items()}
+             for tier, tier_data in final_data["tiers"].items()}
+    assert_price_tables_roundtrip(json_roundtrip(tiers))
+
+
+def test_price_tables_cover_every_encoding():
+    """同骨架下：相同矩阵引用、整体倍数、倍数 + 稀疏差值、全新基准四种情况都能还原"""
+    rows = [{"w": w, "2": 3.1 + w, "5": 7.35 + 2 * w, "8": 12.4 + 3 * w} for w in (1, 2, 5, 10, 20)]
+    base = gen.encode_price_table(rows)
+    scaled = dict(base, m=gen.js_round(np.asarray(base["m"]) * 0.9, 2).tolist())
+    patched = dict(scaled, m=list(scaled["m"]))
+    patched["m"][3] += 0.37
+    other = gen.encode_price_table([{k: (v if k == "w" else v * 2.718 + 1) for k, v in r.items()}
+                                    for r in rows])
+    tiers = json_roundtrip({
+        "T0": {"a": {"prices": base}, "b": {"prices": scaled}},
+        "T1": {"a": {"prices": base}, "b": {"prices_residential": patched, "prices_commercial": other}},
+    })
+    encoded, price_base = assert_price_tables_roundtrip(tiers)
+
+    assert len(price_base["skeletons"]) == 1
+    assert encoded["T1"]["a"]["prices"] == encoded["T0"]["a"]["prices"]
+    assert "k" in encoded["T0"]["b"]["prices"] and "di" not in encoded["T0"]["b"]["prices"]
+    assert "di" in encoded["T1"]["b"]["prices_residential"]
+    assert len(price_base["bases"]) == 2
+
+
+def decode_zip_table(table):
+    """页面 gofoChunk：按前缀解码定宽 36 进制记录串"""
+    cw, sw, rw = table["widths"]
+    step = 2 + cw + sw + rw
+    out = {}
+    for prefix, chunk in table["chunks"].items():
+        assert table["index"][int(prefix)] == "1"
+        rec = chunk["rec"]
+        for i in range(0, len(rec), step):
+            s = int(rec[i + 2 + cw:i + 2 + cw + sw], 36)
+            out[prefix + rec[i:i + 2]] = {
+                "city": chunk["cities"][int(rec[i + 2:i + 2 + cw], 36)],
+                "state": table["states"][s],
+                "cn_state": table["cn_states"][s],
+                "region": table["regions"][int(rec[i + 2 + cw + sw:i + step], 36)],
+            }
+    assert table["index"].count("1") == len(table["chunks"])
+    return out
+
+
+def assert_zip_table_roundtrip(zip_db):
+    decoded = decode_zip_table(json_roundtrip(gen.encode_zip_table(zip_db)))
+    assert set(decoded) == set(zip_db)
+    for z, rec in zip_db.items():
+        assert decoded[z] == {"city": rec["city"], "state": rec["state"],
+                              "cn_state": gen.US_STATES_CN.get(rec["state"], ""), "region": rec["region"]}, z
+
+
+def test_zip_table_roundtrip(final_data):
+    assert final_data["gofo_zips"]
+    assert_zip_table_roundtrip(final_data["gofo_zips"])
+
+
+def test_zip_table_wide_codes():
+    """城市数超过 36 时编码宽度变为 2 位，仍可还原"""
+    zip_db = {f"{p:03d}{s:02d}": {"city": f"City {p}-{s}", "state": ["CA", "NY", "TX", "ZZ"][s % 4],
+                                   "region": f"R{s % 5}"}
+              for p in (0, 7, 999) for s in range(0, 100, 2)}
+    table = gen.encode_zip_table(zip_db)
+    assert table["widths"][0] == 2
+    assert_zip_table_roundtrip(zip_db)
@@ -0,0 +1,89 @@
+"""
+页面报价核心（index.html 里的 quoteCore 脚本，用 node 运行）与 QuoteEngine.quote 逐票一致
+
+页面按生成器真实输出取数据岛与 quoteCore 源码，不经浏览器 / DOM；本机没有 node 时跳过。
+"""
+import itertools
+import json
+import re
+import shutil
+import subprocess
+
+import pytest
+
+import generate_fixed as gen
+import quote_engine as qe
+
+NODE = shutil.which("node")
+pytestmark = pytest.mark.skipif(NODE is None, reason="需要 node 运行页面脚本")
+
+FUEL_RATE = 16.5
+PACKAGES = [  # (L, W, H, 实重)
+    (12, 10, 8, 5.5),
+    (24, 18, 12, 28.3),
+    (40, 30, 20, 65),
+    (60, 35, 30, 120),
+    (110, 40, 30, 160),
+]
+
+DRIVER = """
+const fs = require('fs');
+let DATA = JSON.parse(fs.readFileSync(process.argv[2], 'utf8'));
+%s
+const out = JSON.parse(fs.readFileSync(process.argv[3], 'utf8')).map(([wh, tier, zip, L, W, H, Wt, isRes, sig]) => {
+  let totals = {};
+  quoteChannels(wh, tier, zip, { L, W, H, Wt }, isRes, sig, %s).forEach(q => { totals[q.channel] = q.total; });
+  return totals;
+});
+process.stdout.write(JSON.stringify(out));
+"""
+
+
+def page_scripts(final_data, tmp_path):
+    """生成内联页面，取出数据岛 JSON 与 quoteCore 源码"""
+    path = tmp_path / "index.html"
+    with open(path, "w", encoding="utf-8") as f:
+        gen.write_html(f, gen.build_page_data(final_data))
+    html = path.read_text(encoding="utf-8")
+    data = re.search(r'<script id="quoteData" type="application/json">(.*?)</script>', html, re.S).group(1)
+    core = re.search(r'<script id="quoteCore">(.*?)</script>', html, re.S).group(1)
+    return data, core
+
+
+def fixed_shipments(engine):
+    zips = sorted(engine.zip_db)[:3] + ["90001", "10001", "60601", "99540"]
+    return [[wh, tier, z, *pkg, is_res, sig]
+            for wh, tier, z, pkg, (is_res, sig) in itertools.product(
+                engine.warehouses, engine.tiers, zips, PACKAGES, [(True, False), (False, True)])]
+
+
+def split_channels(final_data):
+    return {ch for tier_data in final_data["tiers"].values() for ch, entry in tier_data.items()
+            if entry.get("prices_residential") and entry.get("prices_commercial")}
+
+
+def test_page_core_matches_engine(final_data, tmp_path):
+    data, core = page_scripts(final_data, tmp_path)
+    engine = qe.QuoteEngine(final_data)
+    shipments = fixed_shipments(engine)
+    (tmp_path / "data.json").write_text(data, encoding="utf-8")
+    (tmp_path / "shipments.json").write_text(json.dumps(shipments), encoding="utf-8")
+    (tmp_path / "driver.js").write_text(DRIVER % (core, FUEL_RATE), encoding="utf-8")
+    result = subprocess.run([NODE, str(tmp_path / "driver.js"), str(tmp_path / "data.json"),
+                             str(tmp_path / "shipments.json")], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    page = json.loads(result.stdout)
+
+    split = split_channels(final_data)
+    assert split, "合成数据里应有商住分表渠道"
+    split_quoted = set()
+    for (wh, tier, z, L, W, H, Wt, is_res, sig), got in zip(shipments, page):
+        expected = {r["channel"]: r["total"] for r in engine.quote(
+            wh, tier, z, (L, W, H), Wt, residential=is_res, signature=sig, fuel_rate=FUEL_RATE)}
+        assert got.keys() == expected.keys(), (wh, tier, z, L, W, H, Wt, is_res)
+        for ch, total in expected.items():
+            assert got[ch] == pytest.approx(total, abs=1e-9), (wh, tier, z, L, W, H, Wt, is_res, ch)
+        split_quoted.update((ch, is_res) for ch in expected.keys() & split)
+
+    # 商住分表渠道（FedEx-632、超大件 FedEx）在住宅与商业两种地址下都要实际报出价来
+    assert split_quoted == {(ch, is_res) for ch in split for is_res in (True, False)}
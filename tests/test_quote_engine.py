@@ -0,0 +1,88 @@
+"""
+QuoteEngine.quote（逐票）与 quote_batch（数组运算）逐行一致
+"""
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import quote_engine as qe
+
+N_PACKAGES = 1500
+FUEL_RATE = 16.5
+
+
+@pytest.fixture(scope="module")
+def engine(final_data):
+    return qe.QuoteEngine(final_data)
+
+
+def random_shipments(engine, n, seed=0):
+    """随机包裹：大部分合法，混入少量非法邮编 / 重量 / Tier 以覆盖错误路径"""
+    rng = random.Random(seed)
+    zips = sorted(engine.zip_db)[:200] + ["90001", "10001", "99540", "96704", "00501"]
+    tiers = list(engine.tiers)
+    rows = []
+    for _ in range(n):
+        big = rng.random() < 0.3
+        rows.append({
+            "warehouse": rng.choice(list(engine.warehouses)),
+            "zip": rng.choice(zips) if rng.random() > 0.02 else rng.choice(["9000a", "12a45", ""]),
+            "L": round(rng.uniform(1, 100 if big else 30), 1),
+            "W": round(rng.uniform(1, 40 if big else 20), 1),
+            "H": round(rng.uniform(1, 30 if big else 15), 1),
+            "weight": round(rng.uniform(0.1, 190 if big else 40), 1) if rng.random() > 0.02 else 0,
+            "addr_type": rng.choice(["res", "com"]),
+            "signature": rng.choice(["true", "false"]),
+            "tier": rng.choice(tiers) if rng.random() > 0.01 else "T9",
+        })
+    return pd.DataFrame(rows)
+
+
+def test_batch_matches_single_quotes(engine):
+    shipments = random_shipments(engine, N_PACKAGES)
+    batch = engine.quote_batch(shipments, fuel_rate=FUEL_RATE)
+    channels = list(engine.channels)
+    quoted = 0
+
+    for i, row in shipments.iterrows():
+        try:
+            rows = engine.quote(row["warehouse"], row["tier"], row["zip"], (row["L"], row["W"], row["H"]),
+                                row["weight"], residential=row["addr_type"] == "res",
+                                signature=row["signature"] == "true", fuel_rate=FUEL_RATE)
+        except ValueError as e:
+            assert batch.at[i, "error"] == str(e)
+            assert batch.loc[i, channels].isna().all()
+            continue
+
+        assert batch.at[i, "error"] == ""
+        expected = {r["channel"]: r["total"] for r in rows}
+        for ch in channels:
+            got = batch.at[i, ch]
+            if ch in expected:
+                assert got == pytest.approx(expected[ch], abs=1e-9), (i, ch)
+            else:
+                assert np.isnan(got), (i, ch)
+        if rows:
+            quoted += 1
+            best = min(rows, key=lambda r: r["total"])
+            assert batch.at[i, "best_total"] == pytest.approx(best["total"], abs=1e-9)
+
+    # 随机样本大部分应有报价，否则上面的比较没有意义
+    assert quoted > N_PACKAGES // 2
+
+
+@pytest.mark.parametrize("kwargs, message", [
+    ({"zip": "9000a"}, "请输入5位邮编"),
+    ({"weight": float("inf")}, "有限数值"),
+    ({"dims": (1, float("nan"), 1)}, "有限数值"),
+    ({"fuel_rate": float("nan")}, "有限数值"),
+    ({"tier": "T9"}, "未知 Tier"),
+])
+def test_quote_rejects_invalid_input(engine, kwargs, message):
+    args = dict(warehouse=next(iter(engine.warehouses)), tier=next(iter(engine.tiers)),
+                zip="90001", dims=(12, 10, 8), weight=5.5)
+    args.update(kwargs)
+    with pytest.raises(ValueError, match=message):
+        engine.quote(**args)
@@ -0,0 +1,55 @@
+"""
+--split-output 重建：换页之后才清理旧分片，且保留被替换页面引用的上一代分片
+"""
+import contextlib
+import copy
+import io
+import os
+
+import pytest
+
+import generate_fixed as gen
+
+
+@pytest.fixture
+def output_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(gen, "OUTPUT_DIR", str(tmp_path))
+    yield str(tmp_path)
+    gen.take_report_records()
+
+
+def build(final_data, output_dir):
+    with contextlib.redirect_stdout(io.StringIO()):
+        gen.write_page(final_data, split_output=True)
+    return gen.page_shard_refs(os.path.join(output_dir, "index.html"))
+
+
+def changed_tier(final_data):
+    """复制一份 final_data，只改第一个 Tier 第一个渠道的燃油费率（价格表去重后在公共基准里，改价格会连带 price-base）"""
+    data = copy.deepcopy(final_data)
+    tier = next(iter(data["tiers"]))
+    next(iter(data["tiers"][tier].values()))["fuel_rate"] += 1
+    return data, tier
+
+
+def test_rebuild_keeps_previous_generation(final_data, output_dir):
+    shard_dir = os.path.join(output_dir, gen.SHARD_DIR)
+    first = build(final_data, output_dir)
+    assert first
+    stale = os.path.join(shard_dir, "tier-T0.000000000000.json")
+    with open(stale, "w") as f:
+        f.write("{}")
+
+    data, tier = changed_tier(final_data)
+    second = build(data, output_dir)
+    changed = {name for name in first - second if name.startswith(f"tier-{tier}.")}
+    assert len(changed) == 1 and len(first - second) == 1
+    # 旧页面的分片 URL 仍可访问，与旧页面无关的残留文件已删除
+    for name in first | second:
+        assert os.path.exists(os.path.join(shard_dir, name)), name
+    assert not os.path.exists(stale)
+
+    # 再重建一次：只保留上一代，最早那一代独有的分片被清理
+    third = build(data, output_dir)
+    assert third == second
+    assert sorted(os.listdir(shard_dir)) == sorted(second)